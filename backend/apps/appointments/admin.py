@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 
-from .models import Appointment
+from .models import Appointment, DoctorStats, ProcessedWebhookEvent
 
 
 @admin.register(Appointment)
@@ -12,3 +12,15 @@ class AppointmentAdmin(admin.ModelAdmin):
     list_filter = ('patient', 'doctor__user', 'working_hours')
     search_fields = ['patient', 'doctor']
 
+
+@admin.register(DoctorStats)
+class DoctorStatsAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'total_appointments', 'total_patients', 'total_earnings', 'updated_at')
+    readonly_fields = ('total_appointments', 'total_patients', 'total_earnings', 'updated_at')
+
+
+@admin.register(ProcessedWebhookEvent)
+class ProcessedWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'type', 'status', 'received_at', 'processed_at')
+    list_filter = ('status', 'type')
+    search_fields = ('event_id',)
@@ -0,0 +1,8 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class SlotFull(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This working hours is at capacity."
+    default_code = "slot_full"
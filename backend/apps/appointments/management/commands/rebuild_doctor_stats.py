@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.appointments.models import DoctorStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-doctor dashboard stats from the appointments table"
+
+    def handle(self, *args, **options):
+        stats = DoctorStats.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {len(stats)} doctor(s)."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.appointments.models import ProcessedWebhookEvent
+from apps.appointments.tasks import process_webhook_events
+
+
+class Command(BaseCommand):
+    help = "Queue failed Stripe webhook events again and process them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "event_ids", nargs="*", help="Stripe event ids to replay, every failed event if omitted"
+        )
+
+    def handle(self, *args, **options):
+        events = ProcessedWebhookEvent.objects.filter(status=ProcessedWebhookEvent.Status.FAILED)
+        if options["event_ids"]:
+            events = events.filter(event_id__in=options["event_ids"])
+
+        queued = events.update(status=ProcessedWebhookEvent.Status.RECEIVED, error="")
+        if not queued:
+            self.stdout.write("No failed events to replay.")
+            return
+
+        result = process_webhook_events()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Replayed {queued} event(s): {result['processed']} processed, {result['failed']} failed."
+            )
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointment_created_at'),
+        ('doctors', '0015_alter_doctor_is_verified'),
+        ('patients', '0003_rename_title_patientfile_name_patientfile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'created_at', 'id'], name='appointment_doctor__f7957a_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_appointment_doctor_created_at_index'),
+        ('doctors', '0015_alter_doctor_is_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorStats',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='doctors.doctor')),
+                ('total_appointments', models.PositiveIntegerField(default=0)),
+                ('total_patients', models.PositiveIntegerField(default=0)),
+                ('total_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Doctor stats',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_doctorstats'),
+        ('doctors', '0016_workinghours_unique_doctor_start_time'),
+        ('patients', '0003_rename_title_patientfile_name_patientfile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'created_at', 'id'], name='appointment_patient_e532b0_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_processedwebhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedwebhookevent',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='processedwebhookevent',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='processedwebhookevent',
+            name='received_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='processedwebhookevent',
+            name='status',
+            field=models.CharField(choices=[('R', 'Received'), ('P', 'Processed'), ('F', 'Failed')], default='P', max_length=1),
+        ),
+        migrations.AlterField(
+            model_name='processedwebhookevent',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='processedwebhookevent',
+            index=models.Index(fields=['status', 'received_at'], name='appointment_status_d021aa_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_webhook_event_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='checkout_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='checkout_session_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='checkout_url',
+            field=models.URLField(blank=True, max_length=1000, null=True),
+        ),
+    ]
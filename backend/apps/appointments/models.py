@@ -1,10 +1,38 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, Q, Count, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from apps.patients.models import Patient
 from apps.doctors.models import Doctor, WorkingHours
 
 
+def reserve_seat(working_hours):
+    """Take a seat of ``working_hours`` with a conditional UPDATE, ``False`` when it is full."""
+    reserved = WorkingHours.objects.filter(
+        pk=working_hours.pk, patient_left__gt=0
+    ).update(patient_left=F('patient_left') - 1)
+    if reserved:
+        _invalidate_doctor(working_hours.doctor_id)
+    return bool(reserved)
+
+
+def release_seat(working_hours_id, doctor_id):
+    WorkingHours.objects.filter(pk=working_hours_id).update(patient_left=F('patient_left') + 1)
+    _invalidate_doctor(doctor_id)
+
+
+def _invalidate_doctor(doctor_id):
+    # Queryset updates skip the WorkingHours signals that keep the doctors snapshot fresh.
+    # Imported here, the snapshot serializers import this module through the reviews app.
+    from apps.doctors import snapshots
+
+    snapshots.invalidate_doctors(doctor_id)
+
+
 class Appointment(models.Model):
     class Status(models.TextChoices):
         PENDING = 'PE', 'Pending'
@@ -35,6 +63,18 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     additional_info = models.TextField(blank=True, null=True)
     payment_id = models.CharField(max_length=100, blank=True, null=True)
+    # Latest Stripe Checkout session, handed out again until it expires
+    checkout_session_id = models.CharField(max_length=255, blank=True, null=True)
+    checkout_url = models.URLField(max_length=1000, blank=True, null=True)
+    checkout_expires_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of each side's appointment list. The doctor one also
+            # serves the dashboard's monthly aggregation over a created_at range.
+            models.Index(fields=['patient', 'created_at', 'id']),
+            models.Index(fields=['doctor', 'created_at', 'id']),
+        ]
     
     
         
@@ -44,14 +84,142 @@ class Appointment(models.Model):
     def cancel(self):
         if(self.status != Appointment.Status.PENDING):
             raise ValidationError('Appointment can be cancelled only when they are pending')
+
+        with transaction.atomic():
+            # Only the request that actually flips the status gives the seat back
+            cancelled = Appointment.objects.filter(
+                pk=self.pk, status=Appointment.Status.PENDING
+            ).update(status=Appointment.Status.CANCELLED)
+            if not cancelled:
+                raise ValidationError('Appointment can be cancelled only when they are pending')
+
+            release_seat(self.working_hours_id, self.doctor_id)
         self.status = Appointment.Status.CANCELLED
-        self.working_hours.patient_left += 1
-        
-        self.save()
         
     def complete(self):
         if self.status == Appointment.Status.DONE or self.status == Appointment.Status.CANCELLED:
             raise ValidationError('Appointment that are done or cancelled or complete cannot be complete')
         
         self.status = Appointment.Status.DONE
-        self.save()
\ No newline at end of file
+        self.save()
+
+
+class DoctorStatsManager(models.Manager):
+    def record_appointment(self, appointment):
+        """Count a newly booked appointment, and its patient if this is their first visit."""
+        is_new_patient = not (
+            Appointment.objects.filter(
+                doctor_id=appointment.doctor_id, patient_id=appointment.patient_id
+            )
+            .exclude(pk=appointment.pk)
+            .exists()
+        )
+        self._increment(
+            appointment.doctor_id,
+            total_appointments=1,
+            total_patients=int(is_new_patient),
+        )
+
+    def record_payment(self, doctor_id, amount):
+        self._increment(doctor_id, total_earnings=amount)
+
+    def record_deletion(self, appointment):
+        """Take a deleted appointment back out of the totals, the reverse of the two above."""
+        # Recounted rather than decremented: a cascade deletes every visit of a
+        # patient before the signals for them run
+        patients = (
+            Appointment.objects.filter(doctor_id=appointment.doctor_id)
+            .values('doctor_id')
+            .annotate(count=Count('patient', distinct=True))
+            .values('count')
+        )
+        values = {
+            'total_appointments': F('total_appointments') - 1,
+            'total_patients': Coalesce(Subquery(patients), 0),
+            'updated_at': timezone.now(),
+        }
+        if appointment.payment_id:
+            values['total_earnings'] = F('total_earnings') - appointment.fees
+        # No row to fall back on creating: the doctor may be going away with the appointment
+        self.filter(doctor_id=appointment.doctor_id).update(**values)
+
+    def _increment(self, doctor_id, **deltas):
+        values = {field: F(field) + delta for field, delta in deltas.items()}
+        values['updated_at'] = timezone.now()
+
+        if not self.filter(doctor_id=doctor_id).update(**values):
+            # First activity for this doctor
+            self.get_or_create(doctor_id=doctor_id)
+            self.filter(doctor_id=doctor_id).update(**values)
+
+    def rebuild(self):
+        """Recompute every doctor's stats from the appointments table."""
+        rows = (
+            Appointment.objects.values('doctor_id')
+            .annotate(
+                total_appointments=Count('id'),
+                total_patients=Count('patient', distinct=True),
+                total_earnings=Coalesce(
+                    Sum('fees', filter=Q(payment_id__isnull=False)), Decimal(0)
+                ),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            self.all().delete()
+            return self.bulk_create(self.model(**row) for row in rows)
+
+
+class DoctorStats(models.Model):
+    """Running totals behind the doctor dashboard, kept up to date as appointments are booked and paid."""
+
+    doctor = models.OneToOneField(
+        Doctor,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    total_appointments = models.PositiveIntegerField(default=0)
+    total_patients = models.PositiveIntegerField(default=0)
+    total_earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DoctorStatsManager()
+
+    class Meta:
+        verbose_name_plural = 'Doctor stats'
+
+    def __str__(self):
+        return f'Stats for {self.doctor}'
+
+
+class ProcessedWebhookEvent(models.Model):
+    """
+    Ledger of Stripe events, so a retried or duplicated delivery is only applied once.
+
+    In the default ``sync`` webhook mode events are handled in the request and
+    recorded as processed. In ``queue`` mode the raw event is stored as
+    received and ``process_webhook_events`` handles it later, in batches.
+    """
+
+    class Status(models.TextChoices):
+        RECEIVED = 'R', 'Received'
+        PROCESSED = 'P', 'Processed'
+        FAILED = 'F', 'Failed'
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    status = models.CharField(choices=Status.choices, default=Status.PROCESSED, max_length=1)
+    payload = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The consumer and the replay command pick up events by status, oldest first
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.type} {self.event_id}'
@@ -0,0 +1,115 @@
+"""
+Stripe access for appointment payments.
+
+A ``StripeClient`` is shared by every request served on the same event loop
+(and one by all sync callers). Its HTTPX transport keeps connections to
+Stripe alive between requests; the async one is bound to the loop it was
+created on, see ``apps.core.loops``.
+
+The latest Checkout session of an appointment is stored on it and handed out
+again while it is still valid, so paying is usually a local lookup. New
+sessions are created under an idempotency key derived from the session they
+replace: double clicks and retries racing each other get the same session
+back from Stripe instead of opening one each.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import stripe
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.loops import LoopLocalCache
+
+from .models import Appointment
+
+# A session this close to expiring is replaced rather than handed out
+REUSE_MARGIN = timedelta(minutes=5)
+
+_clients = LoopLocalCache()
+
+
+def get_stripe_client():
+    return _clients.get(
+        settings.STRIPE_SECRET_KEY,
+        lambda: stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=stripe.HTTPXClient(allow_sync_methods=True),
+        ),
+    )
+
+
+def get_checkout_session_params(appointment_id, doctor_name, fees):
+    """Checkout session parameters for paying an appointment."""
+    return {
+        "payment_method_types": ["card"],
+        "line_items": [
+            {
+                "price_data": {
+                    "currency": "usd",
+                    "product_data": {
+                        "name": f"Appointment with Dr. {doctor_name}",
+                    },
+                    "unit_amount": int(fees * 100),  # Convert to cents
+                },
+                "quantity": 1,
+            }
+        ],
+        "mode": "payment",
+        "success_url": "https://medipoint.decodaai.com/p/my-appointments",  # Replace with your frontend URL
+        "cancel_url": "https://medipoint.decodaai.com/p/my-appointments",
+        "metadata": {"appointment_id": appointment_id},
+    }
+
+
+def get_idempotency_key(appointment_id, previous_session_id):
+    return f"appointment-{appointment_id}-checkout-after-{previous_session_id or 'none'}"
+
+
+def get_reusable_checkout_url(appointment):
+    """The stored checkout URL if it stays valid for a while yet, otherwise ``None``."""
+    if (
+        appointment.checkout_url
+        and appointment.checkout_expires_at
+        and appointment.checkout_expires_at > timezone.now() + REUSE_MARGIN
+    ):
+        return appointment.checkout_url
+    return None
+
+
+def get_session_fields(session):
+    return {
+        "checkout_session_id": session.id,
+        "checkout_url": session.url,
+        "checkout_expires_at": datetime.fromtimestamp(session.expires_at, tz=dt_timezone.utc),
+    }
+
+
+def create_checkout_session(appointment_id, doctor_name, fees, previous_session_id=None):
+    """Create a session and store it on the appointment unless another one replaced it first."""
+    session = get_stripe_client().checkout.sessions.create(
+        params=get_checkout_session_params(appointment_id, doctor_name, fees),
+        options={"idempotency_key": get_idempotency_key(appointment_id, previous_session_id)},
+    )
+    Appointment.objects.filter(
+        pk=appointment_id, checkout_session_id=previous_session_id
+    ).update(**get_session_fields(session))
+    return session
+
+
+async def get_checkout_url_async(appointment):
+    """Checkout URL for ``appointment`` (needs ``doctor__user`` loaded), reusing the stored session."""
+    url = get_reusable_checkout_url(appointment)
+    if url:
+        return url
+
+    previous_session_id = appointment.checkout_session_id
+    session = await get_stripe_client().checkout.sessions.create_async(
+        params=get_checkout_session_params(
+            appointment.pk, appointment.doctor.user.full_name, appointment.fees
+        ),
+        options={"idempotency_key": get_idempotency_key(appointment.pk, previous_session_id)},
+    )
+    await Appointment.objects.filter(
+        pk=appointment.pk, checkout_session_id=previous_session_id
+    ).aupdate(**get_session_fields(session))
+    return session.url
@@ -1,12 +1,21 @@
 from rest_framework import serializers
 
 from apps.doctors.serializers import DoctorSerializer
+from apps.doctors.models import WorkingHours
 from apps.patients.serializers import PatientSerializer
 
 from .models import Appointment 
 
+class UpcomingWorkingHoursField(serializers.PrimaryKeyRelatedField):
+    def get_queryset(self):
+        # Built per request so "upcoming" is relative to now, with the doctor and
+        # their user loaded for the fees and the booking event
+        return WorkingHours.objects.upcoming().select_related("doctor__user")
+
+
 class AppointmentSerializer(serializers.ModelSerializer):
     datetime = serializers.SerializerMethodField()
+    working_hours = UpcomingWorkingHoursField(queryset=WorkingHours.objects.all())
     
     class Meta:
         model = Appointment
@@ -1,32 +1,107 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Appointment
+from .models import Appointment, DoctorStats
+from apps.core.events import publish, subscribe
 from apps.users.tasks import send_email_template
 
+from . import payments
+
 @receiver(post_save, sender=Appointment)
-def send_new_appointment_email_to_doctor(sender, instance, created, **kwargs):
+def publish_appointment_created(sender, instance, created, **kwargs):
     """
-    Send an email to the doctor when a new appointment is created.
-    Optimized to minimize database queries using select_related.
+    Announce a new booking once it is committed.
+    The booking view loads the doctor, patient and working hours with their
+    users, so building the payload costs no extra queries.
     """
-    if not created:
-        return
+    if created:
+        publish("appointment.created", **appointment_payload(instance))
+
+
+@receiver(post_save, sender=Appointment)
+def record_appointment_stats(sender, instance, created, **kwargs):
+    if created:
+        DoctorStats.objects.record_appointment(instance)
+
+
+@receiver(post_delete, sender=Appointment)
+def remove_appointment_stats(sender, instance, **kwargs):
+    DoctorStats.objects.record_deletion(instance)
+
+
+def appointment_payload(appointment):
+    """The appointment data the notification handlers need, from already loaded objects."""
+    return {
+        "appointment_id": appointment.pk,
+        "doctor_name": appointment.doctor.user.full_name,
+        "doctor_email": appointment.doctor.user.email,
+        "patient_name": appointment.patient.user.full_name,
+        "patient_email": appointment.patient.user.email,
+        "start_time": appointment.working_hours.start_time,
+        "fees": appointment.fees,
+    }
 
-    # Fetch the instance with related fields to avoid multiple queries
-    appointment = Appointment.objects.select_related(
-        'doctor__user',  # Fetch doctor and their user in one query
-        'patient__user',  # Fetch patient and their user in one query
-        'working_hours'  # Fetch working hours data
-    ).get(id=instance.id)
 
-    send_email_template.delay(
+@subscribe("appointment.created")
+def send_new_appointment_email_to_doctor(doctor_name, doctor_email, patient_name, patient_email, start_time, **payload):
+    send_email_template(
         "New Appointment Booking – Action Required",
         "emails/new_appointment_doctor.html",
         context={
-            "doctor_name": appointment.doctor.user.full_name,
-            "patient_name": appointment.patient.user.full_name,
-            "appointment_data_time": appointment.working_hours.start_time,
-            "patient_email": appointment.patient.user.email,
-        }, 
-        to_email=appointment.doctor.user.email
-    )
\ No newline at end of file
+            "doctor_name": doctor_name,
+            "patient_name": patient_name,
+            "appointment_data_time": start_time,
+            "patient_email": patient_email,
+        },
+        to_email=doctor_email,
+    )
+
+
+@subscribe("appointment.created")
+def precreate_checkout_session(appointment_id, doctor_name, fees, **payload):
+    """Open the Checkout session ahead of time, so the patient's pay click is a local lookup."""
+    if settings.STRIPE_PRECREATE_CHECKOUT:
+        payments.create_checkout_session(appointment_id, doctor_name, fees)
+
+
+@subscribe("appointment.cancelled")
+def send_cancellation_email(cancelled_by, doctor_name, doctor_email, patient_name, patient_email, start_time, **payload):
+    if cancelled_by == "doctor":
+        send_email_template(
+            "Appointment Cancellation by Doctor",
+            "emails/appointment_cancelled_patient.html",
+            context={
+                "patient_name": patient_name,
+                "doctor_name": doctor_name,
+                "support_email": "MediPoint@decodaai.com",
+                "support_phone": "+123456789",
+            },
+            to_email=patient_email,
+        )
+    elif cancelled_by == "patient":
+        send_email_template(
+            "Appointment Cancellation by Patient",
+            "emails/appointment_cancelled_doctor.html",
+            context={
+                "patient_name": patient_name,
+                "doctor_name": doctor_name,
+                "appointment_date_time": start_time,
+            },
+            to_email=doctor_email,
+        )
+
+
+@subscribe("appointment.paid")
+def send_payment_email_to_doctor(doctor_name, doctor_email, patient_name, start_time, fees, **payload):
+    send_email_template(
+        "Payment Notification to Doctor",
+        "emails/payment_notification_doctor.html",
+        context={
+            "doctor_name": doctor_name,
+            "patient_name": patient_name,
+            "appointment_date_time": start_time,
+            "payment_amount": fees,
+            "payment_method": "Online",
+        },
+        to_email=doctor_email,
+    )
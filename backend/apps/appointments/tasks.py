@@ -0,0 +1,55 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.events import collect_events
+
+from .models import ProcessedWebhookEvent
+from .webhook import process_batch
+
+
+@shared_task
+def process_webhook_events(batch_size=None):
+    """
+    Processes the Stripe events stored by the webhook in ``queue`` mode, oldest
+    first, a batch per transaction. Locked rows are skipped, so several
+    workers can drain the queue side by side. An event that can't be applied
+    is marked as failed with its error, ``replay_webhook_events`` retries it.
+    """
+    batch_size = batch_size or settings.STRIPE_WEBHOOK_BATCH_SIZE
+    processed = failed = 0
+
+    while True:
+        # One dispatch_events task for the notifications of each batch
+        with collect_events(), transaction.atomic():
+            records = list(
+                ProcessedWebhookEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=ProcessedWebhookEvent.Status.RECEIVED)
+                .order_by("received_at")[:batch_size]
+            )
+            if not records:
+                break
+
+            pks = [record.pk for record in records]
+            try:
+                with transaction.atomic():
+                    errors = process_batch(records)
+            except Exception as e:
+                # Nothing in the batch was applied, retry it as a whole later
+                errors = dict.fromkeys(pks, str(e))
+
+            ProcessedWebhookEvent.objects.filter(pk__in=pks).exclude(pk__in=list(errors)).update(
+                status=ProcessedWebhookEvent.Status.PROCESSED, processed_at=timezone.now(), error=""
+            )
+            for pk, error in errors.items():
+                ProcessedWebhookEvent.objects.filter(pk=pk).update(
+                    status=ProcessedWebhookEvent.Status.FAILED, error=error
+                )
+
+        processed += len(records) - len(errors)
+        failed += len(errors)
+        if len(records) < batch_size:
+            break
+
+    return {"processed": processed, "failed": failed}
@@ -1,3 +1,468 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipIf
 
-# Create your tests here.
+import stripe
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.events import dispatch_events
+from apps.doctors.models import Doctor, WorkingHours
+from apps.patients.models import Patient
+from apps.users.models import User
+
+from . import payments
+from .models import Appointment, DoctorStats, ProcessedWebhookEvent
+from .signals import precreate_checkout_session
+from .tasks import process_webhook_events
+
+
+def create_slot(capacity):
+    doctor = User.objects.create_user(
+        email="doctor@example.com", full_name="Doctor", role=User.Roles.DOCTOR
+    ).doctor
+    start = timezone.now() + timedelta(days=1)
+    return WorkingHours.objects.create(
+        doctor=doctor,
+        start_time=start,
+        end_time=start + timedelta(hours=4),
+        patient_left=capacity,
+    )
+
+
+def create_patients(count):
+    users = User.objects.bulk_create(
+        User(email=f"patient{i}@example.com", full_name=f"Patient {i}", role=User.Roles.PATIENT)
+        for i in range(count)
+    )
+    Patient.objects.bulk_create(Patient(user=user) for user in users)
+    return users
+
+
+def book(user, working_hours):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.post("/api/appointments/", {"working_hours": working_hours.pk})
+
+
+@mock.patch("apps.core.events.dispatch_events")
+class AppointmentBookingTests(TestCase):
+    def test_booking_consumes_capacity(self, *mocks):
+        working_hours = create_slot(capacity=2)
+        patient = create_patients(1)[0]
+
+        response = book(patient, working_hours)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        working_hours.refresh_from_db()
+        self.assertEqual(working_hours.patient_left, 1)
+
+    def test_booking_full_slot_is_rejected(self, *mocks):
+        working_hours = create_slot(capacity=1)
+        first, second = create_patients(2)
+
+        self.assertEqual(book(first, working_hours).status_code, status.HTTP_201_CREATED)
+        response = book(second, working_hours)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["detail"].code, "slot_full")
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_cancel_gives_the_seat_back(self, *mocks):
+        working_hours = create_slot(capacity=1)
+        patient = create_patients(1)[0]
+        book(patient, working_hours)
+
+        Appointment.objects.get().cancel()
+
+        working_hours.refresh_from_db()
+        self.assertEqual(working_hours.patient_left, 1)
+
+
+    def test_deleting_gives_the_seat_back(self, *mocks):
+        working_hours = create_slot(capacity=1)
+        patient = create_patients(1)[0]
+        book(patient, working_hours)
+        client = APIClient()
+        client.force_authenticate(patient)
+
+        response = client.delete(f"/api/appointments/{Appointment.objects.get().pk}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        working_hours.refresh_from_db()
+        self.assertEqual(working_hours.patient_left, 1)
+
+    def test_deleting_matches_rebuilt_stats(self, *mocks):
+        working_hours = create_slot(capacity=3)
+        for patient in create_patients(2):
+            book(patient, working_hours)
+        Appointment.objects.filter(patient__user__email="patient0@example.com").update(
+            payment_id="pi_test"
+        )
+        DoctorStats.objects.record_payment(working_hours.doctor_id, Appointment.objects.first().fees)
+
+        Appointment.objects.filter(patient__user__email="patient0@example.com").delete()
+        maintained = DoctorStats.objects.values(
+            "total_appointments", "total_patients", "total_earnings"
+        ).get()
+        DoctorStats.objects.rebuild()
+
+        self.assertEqual(
+            maintained,
+            DoctorStats.objects.values("total_appointments", "total_patients", "total_earnings").get(),
+        )
+        self.assertEqual(maintained["total_appointments"], 1)
+
+    def test_moving_to_another_slot_is_rejected(self, *mocks):
+        working_hours = create_slot(capacity=1)
+        other = WorkingHours.objects.create(
+            doctor=working_hours.doctor,
+            start_time=working_hours.end_time,
+            end_time=working_hours.end_time + timedelta(hours=4),
+            patient_left=1,
+        )
+        patient = create_patients(1)[0]
+        book(patient, working_hours)
+        client = APIClient()
+        client.force_authenticate(patient)
+
+        response = client.patch(
+            f"/api/appointments/{Appointment.objects.get().pk}/", {"working_hours": other.pk}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other.refresh_from_db()
+        self.assertEqual(other.patient_left, 1)
+        self.assertEqual(Appointment.objects.get().working_hours_id, working_hours.pk)
+
+    def test_booking_and_cancelling_refresh_the_doctors_snapshot(self, *mocks):
+        working_hours = create_slot(capacity=2)
+        Doctor.objects.filter(pk=working_hours.doctor_id).update(status=Doctor.Status.AVAILABLE)
+        patient = create_patients(1)[0]
+        client = APIClient()
+        before = client.get("/api/doctors/init/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book(patient, working_hours)
+        booked = client.get("/api/doctors/init/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.get().cancel()
+        cancelled = client.get("/api/doctors/init/")
+
+        self.assertNotEqual(booked["ETag"], before["ETag"])
+        self.assertNotEqual(cancelled["ETag"], booked["ETag"])
+        self.assertIn('"patient_left":1', booked.content.decode().replace(" ", ""))
+
+
+def checkout_session(session_id, expires_in=timedelta(hours=1)):
+    return mock.Mock(
+        id=session_id,
+        url=f"https://checkout.stripe.com/{session_id}",
+        expires_at=int((timezone.now() + expires_in).timestamp()),
+    )
+
+
+def pay(user, appointment):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.post(f"/api/appointments/{appointment.pk}/pay/")
+
+
+@mock.patch("apps.core.events.dispatch_events")
+class AppointmentPayTests(TestCase):
+    def setUp(self):
+        self.patient = create_patients(1)[0]
+        book(self.patient, create_slot(capacity=1))
+        self.appointment = Appointment.objects.get()
+
+        self.stripe = mock.Mock()
+        self.stripe.checkout.sessions.create_async = mock.AsyncMock(
+            return_value=checkout_session("cs_first")
+        )
+        patcher = mock.patch("apps.appointments.payments.get_stripe_client", return_value=self.stripe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pay_returns_and_stores_the_checkout_url(self, *mocks):
+        response = pay(self.patient, self.appointment)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["checkout_url"], "https://checkout.stripe.com/cs_first")
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.checkout_session_id, "cs_first")
+
+    def test_only_pending_appointments_can_be_paid(self, *mocks):
+        Appointment.objects.update(status=Appointment.Status.PAID)
+
+        response = pay(self.patient, self.appointment)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.stripe.checkout.sessions.create_async.assert_not_called()
+
+    def test_other_patients_get_not_found(self, *mocks):
+        other = User.objects.create_user(
+            email="other@example.com", full_name="Other", role=User.Roles.PATIENT
+        )
+
+        self.assertEqual(pay(other, self.appointment).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stripe_errors_are_a_bad_request(self, *mocks):
+        self.stripe.checkout.sessions.create_async.side_effect = stripe.error.APIConnectionError("down")
+
+        response = pay(self.patient, self.appointment)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["detail"], "down")
+
+    def store_session(self, session):
+        Appointment.objects.update(**payments.get_session_fields(session))
+
+    def idempotency_keys(self):
+        return [
+            call.kwargs["options"]["idempotency_key"]
+            for call in self.stripe.checkout.sessions.create_async.call_args_list
+        ]
+
+    @override_settings(STRIPE_PRECREATE_CHECKOUT=True)
+    def test_the_session_opened_at_booking_is_reused(self, *mocks):
+        self.stripe.checkout.sessions.create.return_value = checkout_session("cs_booked")
+        precreate_checkout_session(
+            appointment_id=self.appointment.pk, doctor_name="Doctor", fees=self.appointment.fees
+        )
+
+        for _ in range(2):
+            response = pay(self.patient, self.appointment)
+            self.assertEqual(response.data["checkout_url"], "https://checkout.stripe.com/cs_booked")
+
+        self.stripe.checkout.sessions.create_async.assert_not_called()
+        options = self.stripe.checkout.sessions.create.call_args.kwargs["options"]
+        self.assertEqual(
+            options["idempotency_key"], f"appointment-{self.appointment.pk}-checkout-after-none"
+        )
+
+    def test_sessions_close_to_expiry_are_replaced_under_a_new_key(self, *mocks):
+        pay(self.patient, self.appointment)
+        # cs_first is about to expire, the next payment attempt opens cs_second
+        self.store_session(checkout_session("cs_first", expires_in=timedelta(minutes=1)))
+        self.stripe.checkout.sessions.create_async.return_value = checkout_session("cs_second")
+
+        response = pay(self.patient, self.appointment)
+
+        self.assertEqual(response.data["checkout_url"], "https://checkout.stripe.com/cs_second")
+        self.assertEqual(
+            self.idempotency_keys(),
+            [
+                f"appointment-{self.appointment.pk}-checkout-after-none",
+                f"appointment-{self.appointment.pk}-checkout-after-cs_first",
+            ],
+        )
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.checkout_session_id, "cs_second")
+
+    def test_a_session_stored_meanwhile_is_not_overwritten(self, *mocks):
+        async def replaced_meanwhile(**kwargs):
+            # Another request stored its session while this one waited on Stripe
+            other = checkout_session("cs_other")
+            await Appointment.objects.aupdate(**payments.get_session_fields(other))
+            return checkout_session("cs_first")
+
+        self.stripe.checkout.sessions.create_async.side_effect = replaced_meanwhile
+
+        response = pay(self.patient, self.appointment)
+
+        self.assertEqual(response.data["checkout_url"], "https://checkout.stripe.com/cs_first")
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.checkout_session_id, "cs_other")
+
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def deliver(event):
+    """POST ``event`` to the webhook, signed the way Stripe signs it."""
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return APIClient().post(
+        "/api/webhook/",
+        payload,
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+    )
+
+
+def checkout_completed(event_id, appointment_id, payment_id="pi_test"):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": f"cs_{event_id}",
+                "object": "checkout.session",
+                "metadata": {"appointment_id": str(appointment_id)},
+                "payment_intent": payment_id,
+            }
+        },
+    }
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_WEBHOOK_MODE="sync")
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        book(create_patients(1)[0], create_slot(capacity=1))
+        self.appointment = Appointment.objects.get()
+
+    def deliver_and_notify(self, *events):
+        """Deliver the events, then run the notification handlers they published."""
+        with mock.patch("apps.core.events.dispatch_events") as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                responses = [deliver(event) for event in events]
+        for call in dispatch.delay.call_args_list:
+            dispatch_events(*call.args)
+        return responses
+
+    def earnings(self):
+        return DoctorStats.objects.get(doctor_id=self.appointment.doctor_id).total_earnings
+
+    def test_duplicate_delivery_is_applied_once(self):
+        event = checkout_completed("evt_1", self.appointment.pk)
+
+        first, second = self.deliver_and_notify(event, event)
+
+        self.assertEqual(first.json(), {"status": "success"})
+        self.assertEqual(second.json(), {"status": "duplicate"})
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, Appointment.Status.PAID)
+        self.assertEqual(self.appointment.payment_id, "pi_test")
+        self.assertEqual(self.earnings(), self.appointment.fees)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["doctor@example.com"])
+
+    def test_only_pending_appointments_are_marked_paid(self):
+        Appointment.objects.update(status=Appointment.Status.CANCELLED)
+
+        response, = self.deliver_and_notify(checkout_completed("evt_1", self.appointment.pk))
+
+        self.assertEqual(response.json(), {"status": "success"})
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, Appointment.Status.CANCELLED)
+        self.assertEqual(self.earnings(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_malformed_event_is_marked_failed(self):
+        event = checkout_completed("evt_bad", "not-a-number")
+
+        first, second = self.deliver_and_notify(event, event)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json(), {"status": "failed"})
+        self.assertEqual(second.json(), {"status": "duplicate"})
+        record = ProcessedWebhookEvent.objects.get(event_id="evt_bad")
+        self.assertEqual(record.status, ProcessedWebhookEvent.Status.FAILED)
+        self.assertEqual(record.payload["id"], "evt_bad")
+        self.assertIn("ValueError", record.error)
+
+    def test_bad_signature_is_rejected(self):
+        response = APIClient().post(
+            "/api/webhook/", "{}", content_type="application/json", HTTP_STRIPE_SIGNATURE="t=1,v1=bad"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProcessedWebhookEvent.objects.exists())
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_WEBHOOK_MODE="queue")
+@mock.patch("apps.core.events.dispatch_events")
+class QueuedStripeWebhookTests(TestCase):
+    def setUp(self):
+        working_hours = create_slot(capacity=2)
+        for patient in create_patients(2):
+            book(patient, working_hours)
+        self.pending, self.paid = Appointment.objects.order_by("pk")
+        Appointment.objects.filter(pk=self.paid.pk).update(
+            status=Appointment.Status.PAID, payment_id="pi_earlier"
+        )
+
+    def status_of(self, event_id):
+        return ProcessedWebhookEvent.objects.get(event_id=event_id).status
+
+    def test_events_are_queued_then_processed_in_a_batch(self, dispatch):
+        events = [
+            checkout_completed("evt_ok", self.pending.pk, payment_id="pi_new"),
+            checkout_completed("evt_bad", "not-a-number"),
+            checkout_completed("evt_paid", self.paid.pk, payment_id="pi_again"),
+        ]
+        for event in events:
+            self.assertEqual(deliver(event).json(), {"status": "queued"})
+        self.assertEqual(deliver(events[0]).json(), {"status": "duplicate"})
+        self.assertEqual(self.status_of("evt_ok"), ProcessedWebhookEvent.Status.RECEIVED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = process_webhook_events(batch_size=10)
+
+        self.assertEqual(result, {"processed": 2, "failed": 1})
+        self.assertEqual(self.status_of("evt_ok"), ProcessedWebhookEvent.Status.PROCESSED)
+        self.assertEqual(self.status_of("evt_paid"), ProcessedWebhookEvent.Status.PROCESSED)
+        self.assertEqual(self.status_of("evt_bad"), ProcessedWebhookEvent.Status.FAILED)
+        self.assertIn("ValueError", ProcessedWebhookEvent.objects.get(event_id="evt_bad").error)
+
+        self.pending.refresh_from_db()
+        self.paid.refresh_from_db()
+        self.assertEqual((self.pending.status, self.pending.payment_id), (Appointment.Status.PAID, "pi_new"))
+        # Already paid before the event arrived, left alone
+        self.assertEqual(self.paid.payment_id, "pi_earlier")
+        self.assertEqual(
+            DoctorStats.objects.get(doctor_id=self.pending.doctor_id).total_earnings, self.pending.fees
+        )
+        # One notification batch, announcing the one payment that was applied
+        events, = dispatch.delay.call_args.args
+        self.assertEqual([event["name"] for event in events], ["appointment.paid"])
+
+    def test_consumer_works_through_several_batches(self, dispatch):
+        deliver(checkout_completed("evt_ok", self.pending.pk))
+        deliver(checkout_completed("evt_paid", self.paid.pk))
+
+        result = process_webhook_events(batch_size=1)
+
+        self.assertEqual(result, {"processed": 2, "failed": 0})
+        self.assertFalse(
+            ProcessedWebhookEvent.objects.filter(status=ProcessedWebhookEvent.Status.RECEIVED).exists()
+        )
+
+
+@skipIf(connection.vendor == "sqlite", "SQLite serialises writers, run against PostgreSQL")
+@mock.patch("apps.core.events.dispatch_events")
+class AppointmentBookingConcurrencyTests(TransactionTestCase):
+    capacity = 5
+    attempts = 200
+
+    def test_parallel_bookings_never_overbook(self, *mocks):
+        working_hours = create_slot(capacity=self.capacity)
+        patients = create_patients(self.attempts)
+
+        def attempt(user):
+            try:
+                return book(user, working_hours).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            codes = list(executor.map(attempt, patients))
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), self.capacity)
+        self.assertEqual(codes.count(status.HTTP_409_CONFLICT), self.attempts - self.capacity)
+        self.assertEqual(Appointment.objects.filter(working_hours=working_hours).count(), self.capacity)
+        working_hours.refresh_from_db()
+        self.assertEqual(working_hours.patient_left, 0)
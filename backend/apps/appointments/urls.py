@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework_nested.routers import SimpleRouter, NestedSimpleRouter
-from .views import AppointmentViewSet
+from .views import AppointmentViewSet, AppointmentPayAPIView
 from .webhook import stripe_webhook 
 from apps.reviews.views import ReviewsViewSet
 
@@ -11,6 +11,7 @@ appointment_router = NestedSimpleRouter(router, r'appointments', lookup='appoint
 appointment_router.register(r"reviews", ReviewsViewSet, basename="appointment-reviews")
 
 appointment_routes = [
+    path('appointments/<int:pk>/pay/', AppointmentPayAPIView.as_view(), name='appointments-pay'),
     path('', include(router.urls)),
     path('', include(appointment_router.urls)),
     path('webhook/', stripe_webhook, name='appointment_payment_webhook'),
@@ -1,24 +1,30 @@
 import stripe
 
-from django.conf import settings
-from django.core.exceptions import ValidationError
+from django.db import transaction
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from adrf.views import APIView as AsyncAPIView
 
 
-from apps.users.tasks import send_email_template
+from apps.core.events import publish
+from apps.users.pagination import KeysetPagination
 
+from . import payments
+from .exceptions import SlotFull
 from .serializers import AppointmentSerializer
+from .signals import appointment_payload
 from .permissions import AppointmentPermissions
-from .models import Appointment, WorkingHours
+from .models import Appointment, release_seat, reserve_seat
 
 
 class AppointmentViewSet(viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     permission_classes = [AppointmentPermissions]
+    pagination_class = KeysetPagination
 
     def get_serializer(self, *args, **kwargs):
         # Pass the request context to the serializer
@@ -28,28 +34,53 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_patient:
-            return Appointment.objects.filter(patient=user.patient).select_related("doctor").order_by('-created_at')
+            queryset = Appointment.objects.filter(patient=user.patient).select_related("doctor").order_by('-created_at')
         elif user.is_doctor:
-            return Appointment.objects.filter(doctor=user.doctor).select_related("patient").order_by('-created_at')
-        return Appointment.objects.none()
+            queryset = Appointment.objects.filter(doctor=user.doctor).select_related("patient").order_by('-created_at')
+        else:
+            return Appointment.objects.none()
+
+        if self.action == "cancel":
+            # Both parties' names and emails go into the cancellation event
+            queryset = queryset.select_related("doctor__user", "patient__user", "working_hours")
+        return queryset
 
     def perform_create(self, serializer):
         if not self.request.user.is_patient:
-            raise ValidationError("Only patients can create appointments.")
+            raise PermissionDenied("Only patients can create appointments.")
 
-        working_hour_id = self.request.data.get("working_hours")
-        try:
-            working_hours = WorkingHours.objects.get(id=working_hour_id)
-            if not working_hours.patient_left:
-                raise ValidationError("This working hours is at capacity.")
+        working_hours = serializer.validated_data["working_hours"]
+        doctor = working_hours.doctor
 
-        except WorkingHours.DoesNotExist:
-            raise ValidationError("Invalid doctor ID.")
+        with transaction.atomic():
+            # Take the seat with a conditional UPDATE so concurrent bookings can't overbook
+            if not reserve_seat(working_hours):
+                raise SlotFull()
 
-        fees = working_hours.doctor.fees
-        doctor = working_hours.doctor
+            serializer.save(patient=self.request.user.patient, doctor=doctor, fees=doctor.fees)
 
-        serializer.save(patient=self.request.user.patient, doctor=doctor, fees=fees)
+    def perform_update(self, serializer):
+        working_hours = serializer.validated_data.get("working_hours")
+        if working_hours and working_hours.pk != serializer.instance.working_hours_id:
+            raise ValidationError(
+                {"working_hours": "Cancel the appointment and book the new time instead."}
+            )
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Locked so a concurrent cancel can't give the same seat back twice
+            appointment = (
+                Appointment.objects.select_for_update()
+                .filter(pk=instance.pk)
+                .values("status", "working_hours_id", "doctor_id")
+                .first()
+            )
+            if appointment is None:
+                return
+            instance.delete()
+            if appointment["status"] != Appointment.Status.CANCELLED:
+                release_seat(appointment["working_hours_id"], appointment["doctor_id"])
 
 
     # Patient can cancel appointments they made
@@ -66,82 +97,62 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             )
             
 
-        if request.user.is_doctor:
-            send_email_template.delay(
-                "Appointment Cancellation by Doctor",
-                "emails/appointment_cancelled_patient.html",
-                context={
-                    "patient_name":appointment.patient.user.full_name,
-                    "doctor_name":appointment.doctor.user.full_name,
-                    "support_email":"MediPoint@decodaai.com",
-                    "support_phone":"+123456789"
-                },
-                to_email=appointment.patient.user.email
-            )
-        elif request.user.is_patient:
-            send_email_template.delay(
-                "Appointment Cancellation by Patient",
-                "emails/appointment_cancelled_doctor.html",
-                context={
-                    "patient_name":appointment.patient.user.full_name,
-                    "doctor_name":appointment.doctor.user.full_name,
-                    "appointment_date_time":appointment.working_hours.start_time
-                },
-                to_email=appointment.doctor.user.email
-            )
+        publish(
+            "appointment.cancelled",
+            cancelled_by="doctor" if request.user.is_doctor else "patient",
+            **appointment_payload(appointment),
+        )
 
         return Response({"message": "Appointment canceled"}, status=status.HTTP_200_OK)
 
 
     @action(detail=True, methods=["post"], permission_classes=[AppointmentPermissions])
-    def pay(self, request, pk=None):
-        """Creates a Stripe Checkout session for this appointment."""
+    def complete(self, request, pk=None):
         appointment = self.get_object()
 
-        if not request.user.is_patient or appointment.patient != request.user.patient:
+        try:
+            appointment.complete()
+            return Response({"status": "Appointment completed successfully"}, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    
+
+
+class AppointmentPayAPIView(AsyncAPIView):
+    """
+    Returns a Stripe Checkout URL for an appointment, reusing its stored
+    session while that is still valid.
+
+    Async so the Stripe round trip is awaited rather than holding a worker;
+    served at ``appointments/<pk>/pay/`` in place of a viewset action, since a
+    view can't mix sync and async handlers.
+    """
+    permission_classes = [AppointmentPermissions]
+
+    async def post(self, request, pk=None):
+        if not request.user.is_patient:
             return Response(
                 {"detail": "Only the patient can make a payment."},
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-
-        try:
-            session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": "usd",
-                            "product_data": {
-                                "name": f"Appointment with Dr. {appointment.doctor.user.full_name}",
-                            },
-                            "unit_amount": int(
-                                appointment.fees * 100
-                            ),  # Convert to cents
-                        },
-                        "quantity": 1,
-                    }
-                ],
-                mode="payment",
-                success_url="https://medipoint.decodaai.com/p/my-appointments",  # Replace with your frontend URL
-                cancel_url="https://medipoint.decodaai.com/p/my-appointments",
-                metadata={"appointment_id": appointment.id},
+        appointment = await (
+            Appointment.objects.select_related("doctor__user")
+            .filter(pk=pk, patient_id=request.user.pk)
+            .afirst()
+        )
+        if appointment is None:
+            raise NotFound()
+        if appointment.status != Appointment.Status.PENDING:
+            return Response(
+                {"detail": "Appointment is not awaiting payment."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-            return Response({"checkout_url": session.url}, status=status.HTTP_200_OK)
+        try:
+            checkout_url = await payments.get_checkout_url_async(appointment)
+            return Response({"checkout_url": checkout_url}, status=status.HTTP_200_OK)
 
         except stripe.error.StripeError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-    @action(detail=True, methods=["post"], permission_classes=[AppointmentPermissions])
-    def complete(self, request, pk=None):
-        appointment = self.get_object()
-
-        try:
-            appointment.complete()
-            return Response({"status": "Appointment completed successfully"}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-    
-    
\ No newline at end of file
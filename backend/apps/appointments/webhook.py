@@ -1,20 +1,25 @@
+import json
+from collections import defaultdict
+from decimal import Decimal
+
 import stripe
 
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Value, When
 from django.http import JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from django.shortcuts import get_object_or_404
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 
-from apps.users.tasks import send_email_template
-
-from .models import Appointment
+from apps.core.events import publish
 
+from .models import Appointment, DoctorStats, ProcessedWebhookEvent
+from .signals import appointment_payload
 
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 @csrf_exempt
 @api_view(['POST'])
@@ -33,28 +38,122 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError:
         return JsonResponse({"error": "Invalid signature"}, status=400)
 
-    # Handle event types
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-
-        # Extract metadata (assuming you store appointment ID in metadata)
-        appointment_id = session.get("metadata", {}).get("appointment_id")
-        if appointment_id:
-            appointment = get_object_or_404(Appointment, id=appointment_id)
-            appointment.status = Appointment.Status.PAID
-            appointment.payment_id = session["payment_intent"]
-            appointment.save()
-            send_email_template.delay(
-                "Payment Notification to Doctor",
-                "emails/payment_notification_doctor.html",
-                context={
-                    'doctor_name':appointment.doctor.user.full_name,
-                    'patient_name':appointment.patient.user.full_name,
-                    'appointment_date_time':appointment.working_hours.start_time,
-                    'payment_amount': appointment.fees,
-                    'payment_method': "Online"
-                },
-                to_email=appointment.doctor.user.email
+    if settings.STRIPE_WEBHOOK_MODE == "queue":
+        # Acknowledge straight away, process_webhook_events picks the event up
+        if not record_event(event, status=ProcessedWebhookEvent.Status.RECEIVED, payload=json.loads(payload)):
+            return JsonResponse({"status": "duplicate"}, status=200)
+        return JsonResponse({"status": "queued"}, status=200)
+
+    with transaction.atomic():
+        if not record_event(event, processed_at=timezone.now()):
+            # Stripe retried, or delivered the same event twice
+            return JsonResponse({"status": "duplicate"}, status=200)
+
+        try:
+            payment = get_checkout_payment(event)
+        except (KeyError, TypeError, ValueError) as e:
+            # Retrying won't fix it: keep the event for replay_webhook_events and settle the delivery
+            ProcessedWebhookEvent.objects.filter(event_id=event["id"]).update(
+                status=ProcessedWebhookEvent.Status.FAILED,
+                payload=json.loads(payload),
+                error=f"Malformed event: {e!r}",
+                processed_at=None,
             )
-            
+            return JsonResponse({"status": "failed"}, status=200)
+
+        if payment:
+            mark_paid(*payment)
+
     return JsonResponse({"status": "success"}, status=200)
+
+
+def record_event(event, **fields):
+    """Add the event to the ledger, ``False`` if it is already there."""
+    try:
+        with transaction.atomic():
+            ProcessedWebhookEvent.objects.create(event_id=event["id"], type=event["type"], **fields)
+    except IntegrityError:
+        return False
+    return True
+
+
+def get_checkout_payment(event):
+    """``(appointment_id, payment_id)`` of a completed checkout, ``None`` for anything else."""
+    if event["type"] != "checkout.session.completed":
+        return None
+
+    session = event["data"]["object"]
+    # Extract metadata (assuming you store appointment ID in metadata)
+    appointment_id = (session.get("metadata") or {}).get("appointment_id")
+    if not appointment_id:
+        return None
+    return int(appointment_id), session["payment_intent"]
+
+
+def mark_paid(appointment_id, payment_id):
+    """
+    Move a pending appointment to paid. Only the delivery that actually flips
+    the status records the earnings and announces the payment.
+    """
+    paid = Appointment.objects.filter(
+        pk=appointment_id, status=Appointment.Status.PENDING
+    ).update(status=Appointment.Status.PAID, payment_id=payment_id)
+    if not paid:
+        return False
+
+    appointment = Appointment.objects.select_related(
+        "doctor__user", "patient__user", "working_hours"
+    ).get(pk=appointment_id)
+    DoctorStats.objects.record_payment(appointment.doctor_id, appointment.fees)
+    publish("appointment.paid", **appointment_payload(appointment))
+    return True
+
+
+def process_batch(records):
+    """
+    Apply a batch of stored events with a fixed number of statements: one
+    SELECT and one UPDATE for every payment in the batch, plus one stats
+    update per doctor. Returns ``{record pk: error}`` for events that couldn't
+    be read.
+    """
+    payments = {}
+    errors = {}
+    for record in records:
+        try:
+            payment = get_checkout_payment(record.payload)
+        except (KeyError, TypeError, ValueError) as e:
+            errors[record.pk] = f"Malformed event: {e!r}"
+            continue
+        if payment:
+            appointment_id, payment_id = payment
+            payments.setdefault(appointment_id, payment_id)
+
+    if not payments:
+        return errors
+
+    appointments = list(
+        Appointment.objects.select_related("doctor__user", "patient__user", "working_hours")
+        .select_for_update(of=("self",))
+        .filter(pk__in=payments, status=Appointment.Status.PENDING)
+    )
+    if not appointments:
+        return errors
+
+    Appointment.objects.filter(pk__in=[appointment.pk for appointment in appointments]).update(
+        status=Appointment.Status.PAID,
+        payment_id=Case(
+            *[When(pk=appointment.pk, then=Value(payments[appointment.pk])) for appointment in appointments]
+        ),
+    )
+
+    earnings = defaultdict(Decimal)
+    for appointment in appointments:
+        appointment.status = Appointment.Status.PAID
+        appointment.payment_id = payments[appointment.pk]
+        earnings[appointment.doctor_id] += appointment.fees
+        publish("appointment.paid", **appointment_payload(appointment))
+
+    for doctor_id, amount in earnings.items():
+        DoctorStats.objects.record_payment(doctor_id, amount)
+
+    return errors
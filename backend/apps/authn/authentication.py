@@ -0,0 +1,95 @@
+"""
+JWT handling shared by the session middleware and DRF authentication.
+
+The bearer token is decoded and validated once per request and the outcome is
+kept on the ``HttpRequest``. ``JWTSessionMiddleware`` takes the session key
+from it and ``CachedJWTAuthentication`` reuses it instead of decoding again.
+
+The authenticated user is loaded together with its doctor/patient profile, so
+``request.user`` is the single per-request source for both; see ``get_profile``.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        validated_token = get_validated_token(request)
+        if validated_token is None:
+            return None
+
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        """Same checks as ``JWTAuthentication.get_user``, with the profiles joined in."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = self.user_model.objects.select_related(
+                "doctor__specialty", "patient"
+            ).get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+def get_profile(user):
+    """
+    Returns the doctor or patient profile of ``user``, or ``None``.
+
+    Free for users authenticated by ``CachedJWTAuthentication``, whose profiles
+    were loaded along with them.
+    """
+    if user.is_doctor:
+        return getattr(user, "doctor", None)
+    if user.is_patient:
+        return getattr(user, "patient", None)
+    return None
+
+
+def get_validated_token(request):
+    """
+    Returns the validated bearer token of ``request``, or ``None`` if it has none.
+
+    Invalid tokens raise the same errors as ``JWTAuthentication`` on every call,
+    but the token is only ever decoded once per request.
+    """
+    # DRF's Request wraps the HttpRequest the middleware saw
+    request = getattr(request, "_request", request)
+    if not hasattr(request, "_jwt"):
+        request._jwt = _decode(request)
+
+    validated_token, error = request._jwt
+    if error:
+        raise error
+    return validated_token
+
+
+def _decode(request):
+    authenticator = JWTAuthentication()
+    try:
+        header = authenticator.get_header(request)
+        raw_token = authenticator.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None, None
+        return authenticator.get_validated_token(raw_token), None
+    except (AuthenticationFailed, InvalidToken) as e:
+        return None, e
@@ -1,32 +1,25 @@
-import jwt
 from django.conf import settings
 from django.contrib.sessions.middleware import SessionMiddleware
-from django.contrib.sessions.models import Session
-from django.utils.deprecation import MiddlewareMixin
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 
+from .authentication import get_validated_token
 
-class JWTSessionMiddleware(MiddlewareMixin):
+
+class JWTSessionMiddleware(SessionMiddleware):
     """
-    Overrides default session lookup to read session_id from JWT payload
-    sent in Authorization header.
+    Session middleware that reads the session key from the ``sessionid`` claim
+    of the JWT sent in the Authorization header, falling back to the session
+    cookie. The decoded token is kept on the request for authentication.
     """
 
     def process_request(self, request):
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-
-            try:
-                payload = jwt.decode(
-                    token, settings.SIMPLE_JWT["SIGNING_KEY"], algorithms=["HS256"]
-                )
-                session_id = payload.get("sessionid")
-            except Exception:
-                session_id = None
-        else:
-            session_id = None
+        try:
+            token = get_validated_token(request)
+        except (AuthenticationFailed, InvalidToken):
+            # Rejected later by DRF authentication, with a proper error response
+            token = None
 
-        # Fallback to cookie if JWT does not provide session_id
-        if session_id:
-            request.COOKIES["sessionid"] = session_id
-        # SessionMiddleware will pick up session from request.COOKIES as usual
+        session_key = token.get("sessionid") if token else None
+        if not session_key:
+            session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        request.session = self.SessionStore(session_key)
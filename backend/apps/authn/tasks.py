@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+
+@shared_task
+def purge_expired_sessions(batch_size=None):
+    """
+    Deletes expired sessions a batch at a time, so a large backlog never turns
+    into one long-running DELETE holding locks on the session table.
+    """
+    batch_size = batch_size or settings.SESSION_PURGE_BATCH_SIZE
+    now = timezone.now()
+    deleted = 0
+
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now).values_list("pk", flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        deleted += Session.objects.filter(pk__in=keys).delete()[0]
+
+    return deleted
@@ -1,3 +1,195 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.users.models import User
+from apps.core.events import dispatch_events
+
+from .middlewares import JWTSessionMiddleware
+from .tasks import purge_expired_sessions
+
+
+class MeViewQueryCountTests(TestCase):
+    def client_for(self, role):
+        user = User.objects.create_user(
+            email=f"{role.label.lower()}@example.com", full_name=role.label, role=role
+        )
+        client = APIClient()
+        # A real token, so the authentication path under test is the one used in production
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def test_patient_get_loads_user_and_profile_once(self):
+        client = self.client_for(User.Roles.PATIENT)
+
+        with self.assertNumQueries(1):
+            response = client.get("/api/auth/me/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["user"]["email"], "patient@example.com")
+
+    def test_doctor_get_loads_user_and_profile_once(self):
+        client = self.client_for(User.Roles.DOCTOR)
+
+        # User with profile, then the doctor's working hours and reviews
+        with self.assertNumQueries(3):
+            response = client.get("/api/auth/me/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["user"]["email"], "doctor@example.com")
+
+    def test_patient_put(self):
+        client = self.client_for(User.Roles.PATIENT)
+
+        with self.assertNumQueries(3):
+            response = client.put("/api/auth/me/", {"user": {"full_name": "Renamed"}}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(email="patient@example.com").full_name, "Renamed")
+
+    def test_doctor_put(self):
+        client = self.client_for(User.Roles.DOCTOR)
+
+        with self.assertNumQueries(3):
+            response = client.put(
+                "/api/auth/me/", {"about": "Cardiologist", "user": {"full_name": "Renamed"}}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(email="doctor@example.com").doctor.about, "Cardiologist")
+
+
+class SlowEmailBackend(EmailBackend):
+    """In-memory backend that takes as long as a sluggish mail provider."""
+    latency = 0.5
+
+    def send_messages(self, messages):
+        time.sleep(self.latency)
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="apps.authn.tests.SlowEmailBackend",
+    # Keep password hashing from dominating the timing
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class RegisterViewTests(TestCase):
+    def register(self):
+        return APIClient().post(
+            "/api/auth/register/",
+            {
+                "email": "patient@example.com",
+                "full_name": "Patient",
+                "role": User.Roles.PATIENT,
+                "password": "Sup3r-secret-pass",
+                "password2": "Sup3r-secret-pass",
+            },
+            format="json",
+        )
+
+    def test_registration_does_not_wait_for_mail_provider(self):
+        with mock.patch("apps.core.events.dispatch_events") as dispatch:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                started = time.perf_counter()
+                response = self.register()
+                elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 201)
+        self.assertLess(elapsed, SlowEmailBackend.latency)
+        self.assertEqual(len(callbacks), 1)
+        dispatch.delay.assert_called_once()
+        self.assertEqual(mail.outbox, [])
+
+    def test_single_welcome_and_verification_email(self):
+        with mock.patch("apps.core.events.dispatch_events") as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.register()
+
+        # What the worker does with the queued task
+        dispatch_events(*dispatch.delay.call_args.args)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["patient@example.com"])
+        self.assertIn("Dear Patient", mail.outbox[0].body)
+        self.assertIn("/verify-email/?uid=", mail.outbox[0].alternatives[0][0])
+
+
+class JWTSessionMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="patient@example.com", full_name="Patient", role=User.Roles.PATIENT
+        )
+        self.middleware = JWTSessionMiddleware(lambda request: HttpResponse())
+        self.token_session = self.create_session("token")
+        self.cookie_session = self.create_session("cookie")
+
+    def create_session(self, source):
+        session = SessionStore()
+        session["source"] = source
+        session.create()
+        return session.session_key
+
+    def session_for(self, authorization=None):
+        headers = {"HTTP_AUTHORIZATION": authorization} if authorization else {}
+        request = RequestFactory().get("/api/auth/me/", **headers)
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = self.cookie_session
+        self.middleware.process_request(request)
+        return request.session
+
+    def test_session_comes_from_the_token_claim(self):
+        token = AccessToken.for_user(self.user)
+        token["sessionid"] = self.token_session
+
+        session = self.session_for(f"Bearer {token}")
+
+        self.assertEqual(session.session_key, self.token_session)
+        self.assertEqual(session["source"], "token")
+
+    def test_falls_back_to_the_cookie(self):
+        cases = {
+            "no token": None,
+            "no claim": f"Bearer {AccessToken.for_user(self.user)}",
+            "invalid token": "Bearer not-a-token",
+        }
+        for case, authorization in cases.items():
+            with self.subTest(case):
+                session = self.session_for(authorization)
+
+                self.assertEqual(session.session_key, self.cookie_session)
+                self.assertEqual(session["source"], "cookie")
+
+
+class PurgeExpiredSessionsTests(TestCase):
+    def create_sessions(self, count, expire_in):
+        Session.objects.bulk_create(
+            Session(
+                session_key=f"{expire_in.days}-{i}".ljust(32, "x"),
+                session_data="",
+                expire_date=timezone.now() + expire_in,
+            )
+            for i in range(count)
+        )
+
+    @override_settings(SESSION_PURGE_BATCH_SIZE=2)
+    def test_deletes_expired_sessions_in_batches(self):
+        self.create_sessions(5, expire_in=timedelta(days=-1))
+        self.create_sessions(1, expire_in=timedelta(days=1))
+
+        # A select and a delete per batch of 2, then the select that finds nothing left
+        with self.assertNumQueries(7):
+            deleted = purge_expired_sessions()
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(purge_expired_sessions(), 0)
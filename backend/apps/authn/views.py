@@ -9,9 +9,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from icecream import ic
 from rest_framework import serializers
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 
+from .authentication import get_profile
 from .tokens import email_verification_token
 
 
@@ -42,22 +43,10 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        user = serializer.save(is_email_verified=False)
-
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        token = email_verification_token.make_token(user)
-
-        verify_url = f"{settings.FRONTEND_URL}/verify-email/?uid={uid}&token={token}"
-
-        send_mail(
-            subject="Verify your email",
-            message=f"Click the link to verify your email: {verify_url}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-        )
-
-        return user
+        # The user's post_save publishes "user.registered": one welcome + verification email
+        return serializer.save(is_email_verified=False)
 
 
 
@@ -89,12 +78,7 @@ class MeView(views.APIView):
 
     def get_serializer_class(self):
         """Dynamically return the appropriate serializer class based on user role."""
-        # Get fresh user with relations for serializer determination
-        user = (
-            User.objects.filter(id=self.request.user.id)
-            .select_related("doctor", "patient")
-            .first()
-        )
+        user = self.request.user
 
         if user.is_doctor:
             return DoctorSerializer
@@ -111,15 +95,8 @@ class MeView(views.APIView):
         return {"request": self.request, "view": self}
 
     def get(self, request):
-        user = (
-            User.objects.filter(id=request.user.id)
-            .select_related("doctor", "patient")
-            .first()
-        )
-        if not user:
-            return Response(
-                {"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND
-            )
+        # Authentication already loaded the user together with its profile
+        user = request.user
 
         try:
             serializer_class = self.get_serializer_class()
@@ -129,16 +106,18 @@ class MeView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        instance = user.doctor if user.is_doctor else user.patient
+        instance = get_profile(user)
+        if not instance:
+            return Response(
+                {"detail": "User profile is incomplete."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
     def put(self, request):
-        user = (
-            User.objects.filter(id=request.user.id)
-            .select_related("doctor", "patient")
-            .first()
-        )
+        user = request.user
 
         if not request.data:
             return Response(
@@ -166,7 +145,7 @@ class MeView(views.APIView):
                 {"detail": "User role is invalid."}, status=status.HTTP_403_FORBIDDEN
             )
 
-        instance = user.doctor if user.is_doctor else user.patient
+        instance = get_profile(user)
         if not instance:
             return Response(
                 {"detail": "User profile is incomplete."},
@@ -0,0 +1,43 @@
+"""
+Process-wide registry of LLM chat clients.
+
+Building a ``ChatGoogleGenerativeAI`` sets up a fresh API client with its own
+HTTP transport, so doing it per message pays connection and TLS setup on every
+call. Clients are instead created once per ``(backend, model, temperature)``
+and event loop, and shared by every request served on that loop (see
+``apps.core.loops``): the async client is bound to the loop it was first
+used on.
+
+``CHATBOT_LLM_BACKEND = "fake"`` swaps in a canned, network-free model, which
+is what ``bench_chatbot`` uses to measure our own per-message overhead.
+"""
+from django.conf import settings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from apps.core.loops import LoopLocalCache
+
+MODEL = "gemini-3-flash-preview"
+
+FAKE_RESPONSES = ["Thanks for sharing. How long have you had these symptoms?"]
+
+_clients = LoopLocalCache()
+
+
+def _build_client(backend, model, temperature):
+    if backend == "fake":
+        return FakeListChatModel(responses=FAKE_RESPONSES)
+    if backend == "google":
+        return ChatGoogleGenerativeAI(model=model, temperature=temperature)
+    raise ValueError(f"Unknown CHATBOT_LLM_BACKEND: {backend!r}")
+
+
+def get_chat_model(temperature, model=MODEL):
+    """Return the shared chat client for ``model`` at ``temperature`` on the running loop."""
+    key = (settings.CHATBOT_LLM_BACKEND, model, temperature)
+    return _clients.get(key, lambda: _build_client(*key))
+
+
+def reset_clients():
+    """Forget every cached client, e.g. after changing credentials or the backend."""
+    _clients.clear()
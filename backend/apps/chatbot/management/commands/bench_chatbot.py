@@ -0,0 +1,53 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.chatbot.llm import reset_clients
+from apps.chatbot.medical_chatbot import MedicalChatBot
+
+
+class Command(BaseCommand):
+    help = "Measure per-message chatbot overhead against the fake, network-free LLM backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=200,
+            help="Number of messages to send",
+        )
+        parser.add_argument(
+            "--sessions",
+            type=int,
+            default=10,
+            help="Number of conversations the messages are spread over",
+        )
+
+    def handle(self, *args, **options):
+        session_ids = [str(uuid.uuid4()) for _ in range(options["sessions"])]
+        timings = []
+
+        with override_settings(CHATBOT_LLM_BACKEND="fake"):
+            reset_clients()
+            try:
+                for i in range(options["messages"]):
+                    session_id = session_ids[i % len(session_ids)]
+                    started = time.perf_counter()
+                    MedicalChatBot(chatbot_session_id=session_id).chat("I have a headache")
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                for session_id in session_ids:
+                    MedicalChatBot.delete_chatbot_session(session_id)
+                reset_clients()
+
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(timings)} messages: mean {statistics.mean(timings):.2f} ms, "
+                f"median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+            )
+        )
@@ -0,0 +1,183 @@
+"""
+Local matching of a diagnosed specialty onto the ``Specialty`` table.
+
+The model names the specialty freely ("Dermatology", "Paediatrics", "ENT")
+while the table holds our own wording ("Dermatologist", "Pediatrician"). Most
+of these are resolved here without another LLM round trip:
+
+1. exact lookup on a normalized key (accents, case, punctuation, British
+   spellings and the -ology/-ologist style suffixes are folded away),
+2. a synonym table for names that share no spelling with ours,
+3. fuzzy character and token similarity of the word roots, with the
+   suffixes removed rather than folded.
+
+Only the first two are certain and score 1. The suffixes are shared by most
+specialty names, so they are left out of the fuzzy comparison (otherwise
+"Nephrology" looks like "Neurologist"), and a fuzzy candidate must have a
+root in common with the text. ``SpecialtyMatcher.match`` returns the best candidate
+with a score in ``[0, 1]``; callers fall back to the LLM when it is under
+``CHATBOT_SPECIALTY_MATCH_THRESHOLD``.
+
+The matcher is built once per process from the table and rebuilt when any
+process saves or deletes a specialty (a version number in the shared cache).
+"""
+import difflib
+import re
+import threading
+import time
+import unicodedata
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.doctors.models import Specialty
+
+VERSION_KEY = "chatbot:specialty-matcher:version"
+
+SPELLINGS = {
+    "paed": "ped",
+    "gynaec": "gynec",
+    "haem": "hem",
+    "oesoph": "esoph",
+    "orthopaed": "orthoped",
+}
+
+# Longest suffix first, so "dermatologist" and "dermatology" both fold to "dermatolog"
+SUFFIXES = (
+    ("ologist", "olog"),
+    ("ology", "olog"),
+    ("ician", "ic"),
+    ("ics", "ic"),
+    ("eon", "er"),
+    ("ery", "er"),
+    ("ist", ""),
+    ("y", ""),
+)
+
+SYNONYMS = {
+    "gp": "general physician",
+    "general practice": "general physician",
+    "general practitioner": "general physician",
+    "general medicine": "general physician",
+    "family medicine": "general physician",
+    "family doctor": "general physician",
+    "primary care": "general physician",
+    "internal medicine": "general physician",
+    "internist": "general physician",
+    "obgyn": "gynecology",
+    "ob gyn": "gynecology",
+    "obstetrics": "gynecology",
+    "obstetrics and gynecology": "gynecology",
+    "women s health": "gynecology",
+    "gi": "gastroenterology",
+    "hepatology": "gastroenterology",
+    "digestive diseases": "gastroenterology",
+    "skin": "dermatology",
+    "child health": "pediatrics",
+    "neonatology": "pediatrics",
+    "ent": "otolaryngology",
+    "ear nose and throat": "otolaryngology",
+    "heart": "cardiology",
+    "eye": "ophthalmology",
+    "mental health": "psychiatry",
+    "bones": "orthopedics",
+}
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    for british, american in SPELLINGS.items():
+        text = text.replace(british, american)
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def stem(word):
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def root(word):
+    for suffix, _ in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def make_key(text):
+    return " ".join(stem(word) for word in normalize(text).split())
+
+
+def make_roots(text):
+    return " ".join(root(word) for word in normalize(text).split())
+
+
+def similarity(a, b):
+    """Similarity of two root strings, 0 unless they have a root in common."""
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    common = tokens_a & tokens_b
+    if not common:
+        return 0.0
+    ratio = difflib.SequenceMatcher(None, a, b).ratio()
+    return max(ratio, len(common) / len(tokens_a | tokens_b))
+
+
+class SpecialtyMatcher:
+    def __init__(self, names):
+        self.names = list(names)
+        self.index = {make_key(name): name for name in self.names}
+        self.roots = {make_roots(name): name for name in self.names}
+
+    def match(self, text):
+        """Return ``(name, score)`` for the closest specialty, ``(None, 0)`` if there is none."""
+        key = make_key(text or "")
+        if not key or not self.index:
+            return None, 0.0
+
+        if key in self.index:
+            return self.index[key], 1.0
+
+        synonym = SYNONYMS.get(normalize(text))
+        if synonym and make_key(synonym) in self.index:
+            return self.index[make_key(synonym)], 1.0
+
+        roots = make_roots(text)
+        candidate = max(self.roots, key=lambda known: similarity(roots, known))
+        return self.roots[candidate], similarity(roots, candidate)
+
+
+_matcher = None
+_matcher_version = None
+_lock = threading.Lock()
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_matcher():
+    global _matcher, _matcher_version
+
+    version = get_version()
+    if _matcher is None or _matcher_version != version:
+        with _lock:
+            if _matcher is None or _matcher_version != version:
+                _matcher = SpecialtyMatcher(Specialty.objects.values_list("name", flat=True))
+                _matcher_version = version
+    return _matcher
+
+
+def invalidate():
+    def _invalidate():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            get_version()
+
+    transaction.on_commit(_invalidate)
@@ -1,48 +1,50 @@
 import re
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from apps.doctors.models import Specialty  # Import your Specialty model
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from icecream import ic
 
+from .llm import get_chat_model
+from .matching import get_matcher
+from .stores import get_session_store
 
-# Dictionary to store chat sessions in memory
-chat_sessions = {}
 
-MODEL = "gemini-3-flash-preview"
+SYSTEM_PROMPT = (
+    "You are a highly empathetic and professional virtual doctor assistant. "
+    "Your role is to engage with patients in a natural, human-like manner to gather relevant symptom details. "
+    "Follow these strict guidelines:\n\n"
+    "- Ask only one question at a time to keep the conversation smooth and engaging.\n"
+    "- Never suggest a specific doctor or provide direct medical recommendations.\n"
+    "- Your goal is to collect symptoms and determine the most suitable medical specialty.\n"
+    "- Do not discuss anything unrelated to diagnosing the patient.\n"
+    "- Instead of a thorough medical examination, ask enough targeted questions to narrow down the issue efficiently.\n"
+    "- Avoid excessive questioning—focus on key symptoms and quickly reach a conclusion.\n"
+    "- Always use a warm, conversational tone, avoiding robotic phrasing.\n"
+    "- You can communicate in any language the patient prefers, ensuring accessibility and clarity.\n"
+    "- However, when stating the medical specialty, always return it in English, surrounded by triple asterisks (e.g., ***Cardiology***).\n"
+    "- You must never provide the specialty in any other format or language.\n"
+    "- Once you have identified the specialty, clearly indicate the end of the diagnostic process by saying: '[DIAGNOSIS COMPLETE]'."
+)
+
+GREETING = "Hello! I'm your virtual health assistant. How are you feeling today?"
+
 
 class MedicalChatBot:
     def __init__(self, chatbot_session_id):
         self.chatbot_session_id = chatbot_session_id
+        self.store = get_session_store()
+        # Set once a diagnosis is matched onto one of our specialties
+        self.specialty_exists = False
+
+        # Load conversation history, starting a new one if it doesn't exist or has expired
+        history = self.store.load(chatbot_session_id) or [AIMessage(content=GREETING)]
+        self.messages = [SystemMessage(content=SYSTEM_PROMPT), *history]
 
-        # Initialize conversation history if it doesn't exist
-        if chatbot_session_id not in chat_sessions:
-            chat_sessions[chatbot_session_id] = [
-                SystemMessage(
-                    content=(
-                        "You are a highly empathetic and professional virtual doctor assistant. "
-                        "Your role is to engage with patients in a natural, human-like manner to gather relevant symptom details. "
-                        "Follow these strict guidelines:\n\n"
-                        "- Ask only one question at a time to keep the conversation smooth and engaging.\n"
-                        "- Never suggest a specific doctor or provide direct medical recommendations.\n"
-                        "- Your goal is to collect symptoms and determine the most suitable medical specialty.\n"
-                        "- Do not discuss anything unrelated to diagnosing the patient.\n"
-                        "- Instead of a thorough medical examination, ask enough targeted questions to narrow down the issue efficiently.\n"
-                        "- Avoid excessive questioning—focus on key symptoms and quickly reach a conclusion.\n"
-                        "- Always use a warm, conversational tone, avoiding robotic phrasing.\n"
-                        "- You can communicate in any language the patient prefers, ensuring accessibility and clarity.\n"
-                        "- However, when stating the medical specialty, always return it in English, surrounded by triple asterisks (e.g., ***Cardiology***).\n"
-                        "- You must never provide the specialty in any other format or language.\n"
-                        "- Once you have identified the specialty, clearly indicate the end of the diagnostic process by saying: '[DIAGNOSIS COMPLETE]'."
-                    )
-                ),
-                AIMessage(
-                    content="Hello! I'm your virtual health assistant. How are you feeling today?"
-                ),
-            ]
-
-        # Load conversation history from the dictionary
-        self.messages = chat_sessions[chatbot_session_id]
+    @classmethod
+    async def aload(cls, chatbot_session_id):
+        """Async constructor, the session store may do blocking I/O."""
+        return await sync_to_async(cls)(chatbot_session_id)
 
     def chat(self, user_input):
         """Processes user input, generates AI response, and checks for final diagnosis."""
@@ -50,12 +52,48 @@ class MedicalChatBot:
         self.messages.append(HumanMessage(content=user_input))
 
         # Generate AI response
-        model = ChatGoogleGenerativeAI(model=MODEL, temperature=0.5)
+        model = get_chat_model(temperature=0.5)
         response = model.invoke(self.messages)
-        response_text = response.content
+        return self.complete(response.content)
 
-        # Store AI's response
-        self.messages.append(AIMessage(content=response_text))
+    async def achat(self, user_input):
+        """Async version of ``chat``, awaiting the model instead of blocking on it."""
+        self.messages.append(HumanMessage(content=user_input))
+
+        model = get_chat_model(temperature=0.5)
+        response = await model.ainvoke(self.messages)
+        return await self.acomplete(response.content)
+
+    def stream(self, user_input):
+        """Like ``chat`` but yields the AI response in chunks as it is generated.
+
+        Once exhausted, the final reply (including any diagnosis) is in ``self.reply``.
+        """
+        self.messages.append(HumanMessage(content=user_input))
+
+        model = get_chat_model(temperature=0.5)
+        chunks = []
+        for chunk in model.stream(self.messages):
+            chunks.append(chunk.content)
+            yield chunk.content
+
+        self.reply = self.complete("".join(chunks))
+
+    async def astream(self, user_input):
+        """Async version of ``stream``."""
+        self.messages.append(HumanMessage(content=user_input))
+
+        model = get_chat_model(temperature=0.5)
+        chunks = []
+        async for chunk in model.astream(self.messages):
+            chunks.append(chunk.content)
+            yield chunk.content
+
+        self.reply = await self.acomplete("".join(chunks))
+
+    def complete(self, response_text):
+        """Stores the AI response and turns a finished diagnosis into the final reply."""
+        self.store_response(response_text)
 
         # Check if diagnosis is complete
         if "[DIAGNOSIS COMPLETE]" in response_text:
@@ -64,42 +102,87 @@ class MedicalChatBot:
             matched_specialty = self.match_specialty_with_ai(specialty)
             return f"Diagnosis: {matched_specialty}"
 
-        # Update the session in the dictionary
-        chat_sessions[self.chatbot_session_id] = self.messages
+        return response_text
+
+    async def acomplete(self, response_text):
+        await sync_to_async(self.store_response)(response_text)
+
+        if "[DIAGNOSIS COMPLETE]" in response_text:
+            ic(response_text)
+            specialty = self.extract_specialty(response_text)
+            matched_specialty = await self.amatch_specialty_with_ai(specialty)
+            return f"Diagnosis: {matched_specialty}"
 
         return response_text
 
+    def store_response(self, response_text):
+        # Store AI's response
+        self.messages.append(AIMessage(content=response_text))
+        self.store.save(self.chatbot_session_id, self.messages[1:])
+
     def extract_specialty(self, response_text):
         """Extracts the specialty from the AI response."""
         match = re.search(r"\*\*\*(.*?)\*\*\*", response_text)
         return match.group(1) if match else None
 
     def match_specialty_with_ai(self, specialty):
-        """Uses AI to match the extracted specialty with the available ones in the Specialty model."""
+        """Matches the extracted specialty with the Specialty model, asking the AI only when unsure."""
+        matched_specialty, matching_prompt = self.match_specialty_locally(specialty)
+        if matching_prompt is None:
+            return matched_specialty
+
+        # Ask AI to match the specialty
+        model = get_chat_model(temperature=0.3)
+        response = model.invoke(matching_prompt)
+        return self.resolve_ai_match(specialty, response.content)
+
+    async def amatch_specialty_with_ai(self, specialty):
+        matched_specialty, matching_prompt = await sync_to_async(self.match_specialty_locally)(specialty)
+        if matching_prompt is None:
+            return matched_specialty
+
+        model = get_chat_model(temperature=0.3)
+        response = await model.ainvoke(matching_prompt)
+        return self.resolve_ai_match(specialty, response.content)
+
+    def match_specialty_locally(self, specialty):
+        """
+        Returns ``(specialty, None)`` when the match is settled locally, or
+        ``(None, prompt)`` when the AI has to be asked with ``prompt``.
+        """
         if not specialty:
-            return "no-specialty"
+            return "no-specialty", None
 
-        # Get all available specialties from the database
-        available_specialties = list(Specialty.objects.values_list("name", flat=True))
-        if not available_specialties:
-            return "no-specialty"
+        self.matcher = get_matcher()
+        if not self.matcher.names:
+            return "no-specialty", None
+
+        name, score = self.matcher.match(specialty)
+        if score >= settings.CHATBOT_SPECIALTY_MATCH_THRESHOLD:
+            self.specialty_exists = True
+            return name, None
 
-        # Ask AI to match the specialty
-        model = ChatGoogleGenerativeAI(model=MODEL, temperature=0.3)
         matching_prompt = (
-            f"The identified specialty is '{specialty}'. Here is a list of available specialties: {available_specialties}. "
+            f"The identified specialty is '{specialty}'. Here is a list of available specialties: {self.matcher.names}. "
             "Which specialty from the list best matches the identified specialty? "
             "If there is no close match, respond with 'no-specialty'."
         )
-        response = model.invoke(matching_prompt)
-        detected_specialty = response.content.strip()
+        return None, matching_prompt
+
+    def resolve_ai_match(self, specialty, answer):
+        detected_specialty = answer.strip()
         if detected_specialty == "no-specialty":
             return specialty
 
+        # Only report a match for names that are actually in the list
+        name, score = self.matcher.match(detected_specialty)
+        if score == 1.0:
+            self.specialty_exists = True
+            return name
+
         return detected_specialty
 
     @staticmethod
     def delete_chatbot_session(chatbot_session_id):
-        """Delete the session history from memory."""
-        if chatbot_session_id in chat_sessions:
-            chat_sessions.pop(chatbot_session_id)
+        """Delete the session history from the session store."""
+        get_session_store().delete(chatbot_session_id)
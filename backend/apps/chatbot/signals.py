@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.doctors.models import Specialty
+
+from . import matching
+
+
+@receiver(post_save, sender=Specialty)
+@receiver(post_delete, sender=Specialty)
+def invalidate_specialty_matcher(sender, instance, **kwargs):
+    matching.invalidate()
@@ -0,0 +1,108 @@
+"""
+Storage for chatbot conversation history.
+
+Histories are stored as plain lists of serialized LangChain messages, without
+the system prompt (it is constant and re-added on load). Every save trims the
+history to the last ``CHATBOT_MAX_TURNS`` exchanges and refreshes the idle
+timeout, so a session costs a bounded amount of memory and disappears on its
+own once the patient walks away.
+
+The backend is picked with ``CHATBOT_SESSION_STORE``:
+
+- ``CacheSessionStore`` keeps sessions in a Django cache (``CHATBOT_SESSION_CACHE``),
+  Redis in production or ``DatabaseCache`` for a DB-backed store, so every
+  worker sees the same conversations and they survive restarts.
+- ``InMemorySessionStore`` is a per-process LRU capped at ``CHATBOT_MAX_SESSIONS``,
+  for single-process setups and development.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from langchain.schema import messages_from_dict, messages_to_dict
+
+
+class BaseSessionStore:
+    def __init__(self, ttl=None, max_turns=None):
+        self.ttl = ttl if ttl is not None else settings.CHATBOT_SESSION_TTL
+        self.max_turns = max_turns if max_turns is not None else settings.CHATBOT_MAX_TURNS
+
+    def load(self, session_id):
+        """Return the stored messages of a session, or ``None`` if it has expired."""
+        data = self._get(str(session_id))
+        return None if data is None else messages_from_dict(data)
+
+    def save(self, session_id, messages):
+        # Keep the opening greeting so a trimmed history still reads as a conversation
+        if len(messages) > 2 * self.max_turns + 1:
+            messages = messages[:1] + messages[-2 * self.max_turns:]
+        self._set(str(session_id), messages_to_dict(messages))
+
+    def delete(self, session_id):
+        self._delete(str(session_id))
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, data):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+
+class InMemorySessionStore(BaseSessionStore):
+    def __init__(self, ttl=None, max_turns=None, max_sessions=None):
+        super().__init__(ttl, max_turns)
+        self.max_sessions = max_sessions or settings.CHATBOT_MAX_SESSIONS
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._sessions[key]
+                return None
+            self._sessions.move_to_end(key)
+            return data
+
+    def _set(self, key, data):
+        with self._lock:
+            self._sessions[key] = (time.monotonic() + self.ttl, data)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def _delete(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+
+class CacheSessionStore(BaseSessionStore):
+    key_prefix = "chatbot:session:"
+
+    def __init__(self, ttl=None, max_turns=None, alias=None):
+        super().__init__(ttl, max_turns)
+        self.cache = caches[alias or settings.CHATBOT_SESSION_CACHE]
+
+    def _get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def _set(self, key, data):
+        self.cache.set(self.key_prefix + key, data, self.ttl)
+
+    def _delete(self, key):
+        self.cache.delete(self.key_prefix + key)
+
+
+@lru_cache(maxsize=None)
+def get_session_store():
+    return import_string(settings.CHATBOT_SESSION_STORE)()
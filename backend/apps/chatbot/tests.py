@@ -1,3 +1,267 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from langchain.schema import AIMessage, HumanMessage
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+
+from .llm import FAKE_RESPONSES, reset_clients
+from .matching import SpecialtyMatcher
+from .renderers import EventStreamRenderer, format_event
+from .stores import CacheSessionStore, InMemorySessionStore, get_session_store
+
+SPECIALTIES = [
+    "General physician",
+    "Dermatologist",
+    "Pediatrician",
+    "Neurologist",
+    "Gynecologist",
+    "Gastroenterologist",
+]
+
+
+class SpecialtyMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.matcher = SpecialtyMatcher(SPECIALTIES)
+
+    def test_exact_and_synonym_matches_are_certain(self):
+        cases = {
+            "Dermatology": "Dermatologist",
+            "Paediatrics": "Pediatrician",
+            "neurology": "Neurologist",
+            "OB/GYN": "Gynecologist",
+            "GI": "Gastroenterologist",
+            "Family medicine": "General physician",
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(self.matcher.match(text), (expected, 1.0))
+
+    def test_unrelated_specialties_are_left_to_the_llm(self):
+        for text in ["Nephrology", "Hematology", "Urology", "Cardiology", "Pediatric neurology"]:
+            with self.subTest(text=text):
+                _, score = self.matcher.match(text)
+                self.assertLess(score, settings.CHATBOT_SPECIALTY_MATCH_THRESHOLD)
+
+    def test_empty_text_has_no_match(self):
+        self.assertEqual(self.matcher.match(""), (None, 0.0))
+
+
+def parse_events(body):
+    """``(event, data)`` pairs of a Server-Sent Events body."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def conversation(turns):
+    messages = [AIMessage(content="Hello, how can I help?")]
+    for i in range(turns):
+        messages += [HumanMessage(content=f"Question {i}"), AIMessage(content=f"Answer {i}")]
+    return messages
+
+
+class InMemorySessionStoreTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("apps.chatbot.stores.time.monotonic", return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = InMemorySessionStore(ttl=60, max_turns=2, max_sessions=2)
+
+    def test_round_trips_messages(self):
+        self.store.save("a", conversation(1))
+
+        self.assertEqual(self.store.load("a"), conversation(1))
+        self.store.delete("a")
+        self.assertIsNone(self.store.load("a"))
+
+    def test_trims_history_keeping_the_greeting(self):
+        self.store.save("a", conversation(5))
+
+        messages = self.store.load("a")
+        self.assertEqual(messages[0].content, "Hello, how can I help?")
+        self.assertEqual(
+            [message.content for message in messages[1:]],
+            ["Question 3", "Answer 3", "Question 4", "Answer 4"],
+        )
+
+    def test_evicts_the_least_recently_used_session(self):
+        self.store.save("a", conversation(1))
+        self.store.save("b", conversation(1))
+        self.store.load("a")
+        self.store.save("c", conversation(1))
+
+        self.assertIsNotNone(self.store.load("a"))
+        self.assertIsNone(self.store.load("b"))
+        self.assertIsNotNone(self.store.load("c"))
+
+    def test_sessions_expire_after_ttl_since_last_save(self):
+        self.store.save("a", conversation(1))
+
+        self.clock.return_value += 59
+        self.assertIsNotNone(self.store.load("a"))
+        self.store.save("a", conversation(2))
+        self.clock.return_value += 59
+        self.assertIsNotNone(self.store.load("a"))
+        self.clock.return_value += 1
+        self.assertIsNone(self.store.load("a"))
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "chatbot-tests",
+        }
+    }
+)
+class CacheSessionStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = CacheSessionStore(ttl=60, max_turns=2, alias="default")
+        self.addCleanup(self.store.cache.clear)
+
+    def test_round_trips_messages_with_ttl(self):
+        with mock.patch.object(self.store.cache, "set", wraps=self.store.cache.set) as cache_set:
+            self.store.save("a", conversation(5))
+
+        self.assertEqual(cache_set.call_args.args[0], "chatbot:session:a")
+        self.assertEqual(cache_set.call_args.args[2], 60)
+        self.assertEqual(len(self.store.load("a")), 5)
+        self.store.delete("a")
+        self.assertIsNone(self.store.load("a"))
+
+    def test_sessions_are_shared_across_instances(self):
+        self.store.save("a", conversation(1))
+
+        self.assertEqual(CacheSessionStore(alias="default").load("a"), conversation(1))
+
+
+class GetSessionStoreTests(SimpleTestCase):
+    def setUp(self):
+        get_session_store.cache_clear()
+        self.addCleanup(get_session_store.cache_clear)
+
+    def test_uses_the_configured_backend_once(self):
+        for path, store_class in [
+            ("apps.chatbot.stores.CacheSessionStore", CacheSessionStore),
+            ("apps.chatbot.stores.InMemorySessionStore", InMemorySessionStore),
+        ]:
+            with self.subTest(path=path), override_settings(CHATBOT_SESSION_STORE=path):
+                get_session_store.cache_clear()
+                store = get_session_store()
+                self.assertIsInstance(store, store_class)
+                self.assertIs(get_session_store(), store)
+
+
+@override_settings(
+    CHATBOT_LLM_BACKEND="fake",
+    CHATBOT_SESSION_STORE="apps.chatbot.stores.InMemorySessionStore",
+)
+class ChatBotViewTests(TestCase):
+    def setUp(self):
+        reset_clients()
+        get_session_store.cache_clear()
+        self.addCleanup(get_session_store.cache_clear)
+        self.addCleanup(reset_clients)
+
+        user = User.objects.create_user(
+            email="patient@example.com", full_name="Patient", role=User.Roles.PATIENT
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.session_id = self.client.get("/api/chat/").data["chatbot_session_id"]
+
+    def test_chat_replies_on_every_request(self):
+        # Each request runs the async view on its own event loop under the test client, as under WSGI
+        for message in ["I have a headache", "Since yesterday"]:
+            response = self.client.post(f"/api/chat/{self.session_id}/", {"message": message})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["response"]["text"], FAKE_RESPONSES[0])
+            self.assertFalse(response.data["response"]["is_detected"])
+
+    def test_chat_requires_a_known_session(self):
+        response = self.client.post(
+            "/api/chat/00000000-0000-0000-0000-000000000000/", {"message": "Hello"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_sends_tokens_then_done(self):
+        response = self.client.post(
+            f"/api/chat/{self.session_id}/stream/",
+            {"message": "I have a headache"},
+            HTTP_ACCEPT="text/event-stream",
+        )
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["X-Accel-Buffering"], "no")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        events = parse_events(b"".join(response).decode())
+        *tokens, (last_event, last_data) = events
+        self.assertTrue(tokens)
+        self.assertTrue(all(event == "token" for event, _ in tokens))
+        self.assertEqual("".join(data["text"] for _, data in tokens), FAKE_RESPONSES[0])
+        self.assertEqual(last_event, "done")
+        self.assertEqual(last_data["response"]["text"], FAKE_RESPONSES[0])
+
+    def test_stream_reports_generation_failures_as_an_error_frame(self):
+        async def failing_stream(self, user_input):
+            yield "Hel"
+            raise RuntimeError("model unavailable")
+
+        with mock.patch("apps.chatbot.views.MedicalChatBot.astream", failing_stream):
+            response = self.client.post(
+                f"/api/chat/{self.session_id}/stream/",
+                {"message": "Hello"},
+                HTTP_ACCEPT="text/event-stream",
+            )
+            events = parse_events(b"".join(response).decode())
+
+        self.assertEqual(events, [("token", {"text": "Hel"}), ("error", {"error": "model unavailable"})])
+
+    def test_chat_session_store_failures_are_an_error_response(self):
+        with mock.patch("apps.chatbot.views.MedicalChatBot.aload", side_effect=ConnectionError("cache down")):
+            response = self.client.post(f"/api/chat/{self.session_id}/", {"message": "Hello"})
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data, {"error": "cache down"})
+
+    def test_stream_session_store_failures_are_an_error_frame(self):
+        with mock.patch("apps.chatbot.views.MedicalChatBot.aload", side_effect=ConnectionError("cache down")):
+            response = self.client.post(
+                f"/api/chat/{self.session_id}/stream/",
+                {"message": "Hello"},
+                HTTP_ACCEPT="text/event-stream",
+            )
+            events = parse_events(b"".join(response).decode())
+
+        self.assertEqual(events, [("error", {"error": "cache down"})])
+
+    def test_stream_errors_before_streaming_are_rendered_as_events(self):
+        response = self.client.post(
+            f"/api/chat/{self.session_id}/stream/", {}, HTTP_ACCEPT="text/event-stream"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            parse_events(response.content.decode()), [("error", {"message": "Message is required"})]
+        )
+
+
+class EventStreamRendererTests(SimpleTestCase):
+    def test_format_event_is_one_frame(self):
+        self.assertEqual(
+            format_event("token", {"text": "Hi\nthere"}),
+            'event: token\ndata: {"text": "Hi\\nthere"}\n\n',
+        )
+
+    def test_renderer_renders_errors_as_an_error_event(self):
+        body = EventStreamRenderer().render({"detail": "Not found."})
+
+        self.assertEqual(parse_events(body.decode()), [("error", {"detail": "Not found."})])
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import ChatBotAPIView, StartChatBotAPIView, EndChatBotAPIView
+from .views import ChatBotAPIView, ChatBotStreamAPIView, StartChatBotAPIView, EndChatBotAPIView
 
 chatbot_routes = [
     path('chat/<uuid:chatbot_session_id>/end/', EndChatBotAPIView.as_view(), name='chatbot_end'),
+    path('chat/<uuid:chatbot_session_id>/stream/', ChatBotStreamAPIView.as_view(), name='chatbot_stream'),
     path('chat/<uuid:chatbot_session_id>/', ChatBotAPIView.as_view(), name='chatbot_start'),
     path('chat/', StartChatBotAPIView.as_view(), name='chatbot_message'),
 ]
\ No newline at end of file
@@ -1,11 +1,14 @@
+from django.http import StreamingHttpResponse
+from adrf.views import APIView as AsyncAPIView
 from rest_framework.views import APIView
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
 from .medical_chatbot import MedicalChatBot
+from .renderers import EventStreamRenderer, format_event
 from rest_framework.permissions import IsAuthenticated
 import uuid
 from icecream import ic
-from apps.doctors.models import Specialty
 
 CHATBOT_SESSION_ID = "chatbot_session_id"
 
@@ -27,21 +30,26 @@ class StartChatBotAPIView(APIView):
         )
 
 
-class ChatBotAPIView(APIView):
+class ChatBotAPIView(AsyncAPIView):
+    """
+    Async view: the model call is awaited, so under ASGI a single worker can
+    hold many conversations while they wait on the LLM.
+    """
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, *args, **kwargs):
+    async def get_chat_input(self, request, kwargs):
+        """Returns ``(chatbot_session_id, user_input, error_response)`` for a chat request."""
         # Extract session ID from the request
         chatbot_session_id = str(kwargs.get(CHATBOT_SESSION_ID, ""))
         if not chatbot_session_id:
-            return Response(
+            return None, None, Response(
                 {"message": "Session ID is required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        session_data = request.session.get(CHATBOT_SESSION_ID, [])
+        session_data = await request.session.aget(CHATBOT_SESSION_ID, [])
 
         if chatbot_session_id not in session_data:
-            return Response(
+            return None, None, Response(
                 {"error": "Chatbot Session with this ID does not exist"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
@@ -49,44 +57,81 @@ class ChatBotAPIView(APIView):
         # Extract user input from the request
         user_input = request.data.get("message", "").strip()
         if not user_input:
-            return Response(
+            return None, None, Response(
                 {"message": "Message is required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Initialize or retrieve the chatbot for this session
-        chatbot = MedicalChatBot(chatbot_session_id=chatbot_session_id)
+        return chatbot_session_id, user_input, None
+
+    def build_response(self, chatbot, bot_response):
+        response = {
+            "text": bot_response,
+            "is_detected": False
+        }
+        ic(bot_response)
+        if bot_response.startswith("Diagnosis:"):
+            extracted_specialty = bot_response[10:].strip()
+            ic(extracted_specialty)
+
+            # Already matched against the Specialty table by the chatbot
+            response['specialty'] = extracted_specialty
+            response['is_existed'] = chatbot.specialty_exists
+            response["is_detected"] = True
+
+        return {"response": response}
+
+    async def post(self, request, *args, **kwargs):
+        chatbot_session_id, user_input, error = await self.get_chat_input(request, kwargs)
+        if error:
+            return error
 
-        # Get the chatbot response
         try:
-            bot_response = chatbot.chat(user_input)
-            response = {
-                "text": bot_response,
-                "is_detected": False
-            }
-            ic(bot_response)
-            if bot_response.startswith("Diagnosis:"):
-                extracted_specialty = bot_response[10:].strip()
-                ic(extracted_specialty)
-                
-                specialty = Specialty.objects.filter(name__icontains=extracted_specialty)                
-                if specialty.count():
-                    specialty_name = specialty[0].name
-                    is_existed = True
-                else:
-                    is_existed = False
-                    specialty_name = extracted_specialty
-                    
-                response['specialty'] = specialty_name
-                response['is_existed'] = is_existed
-                response["is_detected"] = True
-
-            return Response({"response": response}, status=status.HTTP_200_OK)
+            # Initialize or retrieve the chatbot for this session
+            chatbot = await MedicalChatBot.aload(chatbot_session_id=chatbot_session_id)
+
+            # Get the chatbot response
+            bot_response = await chatbot.achat(user_input)
+            return Response(self.build_response(chatbot, bot_response), status=status.HTTP_200_OK)
         except Exception as e:
             return Response(
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+class ChatBotStreamAPIView(ChatBotAPIView):
+    """
+    Streaming variant of ``ChatBotAPIView`` using Server-Sent Events.
+
+    Each generated chunk is sent as a ``token`` event (``{"text": ...}``) as soon as
+    the model produces it. The last frame is a ``done`` event carrying the same
+    payload ``ChatBotAPIView`` returns, including the detected specialty, or an
+    ``error`` event if generation fails part way.
+    """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    async def post(self, request, *args, **kwargs):
+        chatbot_session_id, user_input, error = await self.get_chat_input(request, kwargs)
+        if error:
+            return error
+
+        async def events():
+            try:
+                # Loaded inside the stream, so a failing session store ends in an error frame too
+                chatbot = await MedicalChatBot.aload(chatbot_session_id=chatbot_session_id)
+                async for text in chatbot.astream(user_input):
+                    if text:
+                        yield format_event("token", {"text": text})
+                yield format_event("done", self.build_response(chatbot, chatbot.reply))
+            except Exception as e:
+                yield format_event("error", {"error": str(e)})
+
+        response = StreamingHttpResponse(events(), content_type=EventStreamRenderer.media_type)
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class EndChatBotAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -0,0 +1,101 @@
+"""
+Domain events, handed to Celery only once the data they describe is committed.
+
+Code that changes state calls ``publish("appointment.created", **payload)``
+instead of enqueueing tasks itself. The event is held back with
+``transaction.on_commit``, so nothing fires for a rolled-back transaction and
+no broker round trip happens while the transaction is open. Within a request
+(``DomainEventsMiddleware``) or a ``collect_events()`` block (``acollect_events()``
+in async code), committed events are gathered and published together as one
+``dispatch_events`` task; anywhere else each event is published as soon as it
+commits.
+
+Handlers are registered with ``@subscribe(name)`` and run in the worker with
+the payload as keyword arguments. Payloads carry the data the publisher had
+already loaded (names, emails, times), so handlers don't query the database
+again. They go through Celery's JSON serializer, which handles datetimes
+and decimals.
+"""
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from celery import shared_task
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+_pending = ContextVar("domain_events", default=None)
+
+
+def subscribe(name):
+    """Register the decorated function as a handler of the ``name`` event."""
+    def decorator(handler):
+        _handlers[name].append(handler)
+        return handler
+    return decorator
+
+
+def publish(name, using=None, **payload):
+    """Publish an event once the current transaction on ``using`` commits."""
+    event = {"name": name, "payload": payload}
+    transaction.on_commit(lambda: _committed(event), using=using)
+
+
+def _committed(event):
+    batch = _pending.get()
+    if batch is None:
+        _send([event])
+    else:
+        batch.append(event)
+
+
+def _send(events):
+    try:
+        dispatch_events.delay(events)
+    except Exception:
+        # The data is already committed, a broker outage shouldn't turn that into an error
+        logger.exception("Could not publish %d domain event(s)", len(events))
+
+
+@contextmanager
+def collect_events():
+    """Publish every event committed inside the block as a single batch on exit."""
+    token = _pending.set([])
+    try:
+        yield
+    finally:
+        events = _pending.get()
+        _pending.reset(token)
+        if events:
+            _send(events)
+
+
+@asynccontextmanager
+async def acollect_events():
+    """``collect_events`` for async code, the broker round trip on exit runs in a thread."""
+    token = _pending.set([])
+    try:
+        yield
+    finally:
+        events = _pending.get()
+        _pending.reset(token)
+        if events:
+            await sync_to_async(_send)(events)
+
+
+@shared_task
+def dispatch_events(events):
+    """Run the handlers of every event in the batch, one failing handler doesn't stop the others."""
+    handled = 0
+    for event in events:
+        for handler in _handlers.get(event["name"], ()):
+            try:
+                handler(**event["payload"])
+                handled += 1
+            except Exception:
+                logger.exception("Handler %s failed for %s", handler.__qualname__, event["name"])
+    return handled
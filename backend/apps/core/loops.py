@@ -0,0 +1,50 @@
+"""
+Clients cached per event loop.
+
+Async HTTP and gRPC clients bind their connections to the loop that first
+uses them. Under ASGI each worker runs a single loop, so one client per
+worker is shared by every request. Under WSGI (or ``runserver``) async views
+run through ``async_to_sync`` on a new loop per request, and a client cached
+from an earlier request would be tied to a closed loop. ``LoopLocalCache``
+keys clients by the running loop (``None`` for sync callers) and drops the
+ones whose loop has been closed.
+"""
+import asyncio
+import threading
+
+
+def get_running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class LoopLocalCache:
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """Return the client for ``key`` on the running loop, building it with ``factory()``."""
+        loop_key = (get_running_loop(), key)
+        client = self._clients.get(loop_key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(loop_key)
+                if client is None:
+                    self._discard_closed()
+                    client = self._clients[loop_key] = factory()
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def _discard_closed(self):
+        closed = [key for key in self._clients if key[0] is not None and key[0].is_closed()]
+        for key in closed:
+            del self._clients[key]
@@ -0,0 +1,26 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .events import acollect_events, collect_events
+
+
+class DomainEventsMiddleware:
+    """Publish the domain events of a request in one batch once it has been handled."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI the chain stays async, so async views aren't run through async_to_sync
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect_events():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        async with acollect_events():
+            return await self.get_response(request)
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+
+from .events import publish
+from .loops import LoopLocalCache
+from .middlewares import DomainEventsMiddleware
+
+
+@mock.patch("apps.core.events.dispatch_events")
+class DomainEventsMiddlewareTests(TransactionTestCase):
+    async def test_async_chain_stays_async_and_publishes_one_batch(self, dispatch_events):
+        def publish_two():
+            publish("first.event", value=1)
+            publish("second.event", value=2)
+
+        async def view(request):
+            await sync_to_async(publish_two)()
+            return "response"
+
+        middleware = DomainEventsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        response = await middleware(RequestFactory().get("/"))
+
+        self.assertEqual(response, "response")
+        dispatch_events.delay.assert_called_once_with(
+            [
+                {"name": "first.event", "payload": {"value": 1}},
+                {"name": "second.event", "payload": {"value": 2}},
+            ]
+        )
+
+    def test_sync_chain_publishes_one_batch(self, dispatch_events):
+        def view(request):
+            publish("first.event", value=1)
+            publish("second.event", value=2)
+            return "response"
+
+        middleware = DomainEventsMiddleware(view)
+        self.assertFalse(iscoroutinefunction(middleware))
+
+        self.assertEqual(middleware(RequestFactory().get("/")), "response")
+        self.assertEqual(len(dispatch_events.delay.call_args.args[0]), 2)
+
+
+class LoopLocalCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LoopLocalCache()
+
+    def get(self):
+        return self.cache.get("client", object)
+
+    async def aget_twice(self):
+        return self.get(), self.get()
+
+    def test_sync_callers_share_one_client(self):
+        self.assertIs(self.get(), self.get())
+
+    def test_clients_are_shared_within_a_loop_only(self):
+        first, again = async_to_sync(self.aget_twice)()
+        second, _ = async_to_sync(self.aget_twice)()
+
+        self.assertIs(first, again)
+        self.assertIsNot(first, second)
+        self.assertIsNot(first, self.get())
+
+    def test_clients_of_closed_loops_are_dropped(self):
+        for _ in range(3):
+            async_to_sync(self.aget_twice)()
+
+        # Each async_to_sync call ran on its own loop, closed once it returned
+        self.get()
+        self.assertEqual(len(self.cache), 1)
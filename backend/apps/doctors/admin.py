@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib import messages
 
-from apps.users.tasks import send_email_template
+from apps.users.tasks import send_email_template_batch
 from .models import Doctor, Specialty, Schedule, WorkingHours
 from .forms import ScheduleTabularInlineModelForm
 
@@ -27,8 +27,8 @@ class ScheduleAdmin(admin.ModelAdmin):
     
 @admin.register(WorkingHours)
 class WorkingHoursAdmin(admin.ModelAdmin):
-    list_display = ['start_time', 'end_time','doctor']
-    list_filter = ['doctor__user__full_name']
+    list_display = ['start_time', 'end_time','doctor', 'status']
+    list_filter = ['status', 'doctor__user__full_name']
     search_fields = ['doctor']
 
 
@@ -46,23 +46,26 @@ def verify_doctors(modeladmin, request, queryset):
     # Update the verification status in a single query
     updated_count = doctors.update(is_verified=True)
 
-    # Send verification emails asynchronously using Celery
-    for doctor in doctors.iterator():
-        try:
-            # Call the Celery task to send the email
-            send_email_template.delay(
-                subject="Doctor Verification Confirmation",
-                template_name="emails/doctor_verified.html",
-                context={
-                    "doctor_name": doctor.user.full_name,
-                    "support_email": "MediPoint@decodaai.com",
-                    "support_phone": "+123456789",
-                },
-                to_email=doctor.user.email
-            )
-        except Exception as e:
-            # Log the error and continue with the next doctor
-            messages.warning(request, f"Failed to schedule email for {doctor.user.email}: {str(e)}")
+    # Send all verification emails from a single Celery task
+    recipients = [
+        (
+            {
+                "doctor_name": doctor.user.full_name,
+                "support_email": "MediPoint@decodaai.com",
+                "support_phone": "+123456789",
+            },
+            doctor.user.email,
+        )
+        for doctor in doctors.iterator()
+    ]
+    try:
+        send_email_template_batch.delay(
+            subject="Doctor Verification Confirmation",
+            template_name="emails/doctor_verified.html",
+            recipients=recipients,
+        )
+    except Exception as e:
+        messages.warning(request, f"Failed to schedule verification emails: {str(e)}")
 
     # Notify the admin of the successful verification
     messages.success(request, f"{updated_count} doctor(s) have been verified.")
@@ -1,10 +1,60 @@
 import django_filters
-from .models import Doctor
+from django.db.models import F
+from django_filters.constants import EMPTY_VALUES
+from .models import Doctor, WorkingHours
+
+
+class NullsLastOrderingFilter(django_filters.OrderingFilter):
+    """Ordering that keeps rows without a value (doctors without reviews) last either way, ties broken by pk."""
+
+    def get_ordering_value(self, param):
+        value = super().get_ordering_value(param)
+        if value.startswith('-'):
+            return F(value[1:]).desc(nulls_last=True)
+        return F(value).asc(nulls_last=True)
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return qs.order_by(*[self.get_ordering_value(param) for param in value], 'pk')
+
 
 class DoctorFilter(django_filters.FilterSet):
     # Add a filter for the 'specialty' field
     specialty = django_filters.CharFilter(field_name='specialty__slug', lookup_expr='icontains')
+    min_rating = django_filters.NumberFilter(field_name='rating__rating_avg', lookup_expr='gte')
+    min_reviews = django_filters.NumberFilter(field_name='rating__rating_count', lookup_expr='gte')
+    ordering = NullsLastOrderingFilter(
+        fields=(
+            ('rating__rating_avg', 'rating'),
+            ('rating__rating_count', 'review_count'),
+            ('fees', 'fees'),
+        )
+    )
 
     class Meta:
         model = Doctor
-        fields = ['specialty']  # Specify the fields you want to filter on
\ No newline at end of file
+        fields = ['specialty', 'min_rating', 'min_reviews']  # Specify the fields you want to filter on
+
+
+class AvailabilityFilter(django_filters.FilterSet):
+    specialty = django_filters.CharFilter(field_name='doctor__specialty__slug')
+    start_from = django_filters.IsoDateTimeFilter(field_name='start_time', lookup_expr='gte')
+    start_to = django_filters.IsoDateTimeFilter(field_name='start_time', lookup_expr='lte')
+    max_fees = django_filters.NumberFilter(field_name='doctor__fees', lookup_expr='lte')
+    has_capacity = django_filters.BooleanFilter(method='filter_has_capacity')
+
+    class Meta:
+        model = WorkingHours
+        fields = ['specialty', 'start_from', 'start_to', 'max_fees', 'has_capacity']
+
+    def __init__(self, data=None, *args, **kwargs):
+        # Only slots that can still be booked unless asked otherwise
+        if data is not None and 'has_capacity' not in data:
+            data = data.copy()
+            data['has_capacity'] = 'true'
+        super().__init__(data, *args, **kwargs)
+
+    def filter_has_capacity(self, queryset, name, value):
+        # has_capacity=false also lists full slots
+        return queryset.filter(patient_left__gt=0) if value else queryset
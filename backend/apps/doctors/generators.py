@@ -0,0 +1,73 @@
+import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Days, Schedule, WorkingHours
+from . import snapshots
+
+# Indexed by date.weekday()
+WEEKDAYS = [Days.MON, Days.TUE, Days.WED, Days.THU, Days.FRI, Days.SAT, Days.SUN]
+
+
+def generate_working_hours(days=None, chunk_size=100):
+    """
+    Create the working hours every schedule implies over the next ``days`` days.
+
+    Doctors are processed ``chunk_size`` at a time: their candidate slots are built
+    in memory, the ones that already exist are fetched in a single query and the
+    rest are inserted with one ``bulk_create``. Running it again is a no-op.
+    Returns the number of working hours created.
+    """
+    days = days or settings.WORKING_HOURS_HORIZON_DAYS
+    today = timezone.localdate()
+
+    dates_by_day = {}
+    for offset in range(days):
+        date = today + datetime.timedelta(days=offset)
+        dates_by_day.setdefault(WEEKDAYS[date.weekday()], []).append(date)
+
+    window_start = timezone.make_aware(datetime.datetime.combine(today, datetime.time.min))
+    window_end = window_start + datetime.timedelta(days=days)
+
+    window = WorkingHours.objects.filter(start_time__gte=window_start, start_time__lt=window_end)
+
+    doctor_ids = (
+        Schedule.objects.order_by("doctor_id")
+        .values_list("doctor_id", flat=True)
+        .distinct()
+        .iterator()
+    )
+
+    created = 0
+    while chunk := list(islice(doctor_ids, chunk_size)):
+        candidates = {}
+        for schedule in Schedule.objects.filter(doctor_id__in=chunk):
+            for date in dates_by_day.get(schedule.day, ()):
+                start_time = timezone.make_aware(datetime.datetime.combine(date, schedule.start_time))
+                candidates.setdefault(
+                    (schedule.doctor_id, start_time),
+                    WorkingHours(
+                        doctor_id=schedule.doctor_id,
+                        start_time=start_time,
+                        end_time=timezone.make_aware(datetime.datetime.combine(date, schedule.end_time)),
+                        patient_left=schedule.max_patients,
+                    ),
+                )
+
+        existing = set(window.filter(doctor_id__in=chunk).values_list("doctor_id", "start_time"))
+        new_working_hours = [wh for key, wh in candidates.items() if key not in existing]
+        if not new_working_hours:
+            continue
+
+        # The unique constraint absorbs rows inserted concurrently since the lookup above.
+        # Those are skipped without a trace, so the rows are counted around the insert.
+        before = window.filter(doctor_id__in=chunk).count()
+        WorkingHours.objects.bulk_create(new_working_hours, batch_size=500, ignore_conflicts=True)
+        created += window.filter(doctor_id__in=chunk).count() - before
+
+        # bulk_create skips post_save, so refresh the init snapshot explicitly
+        snapshots.invalidate_doctors(*{wh.doctor_id for wh in new_working_hours})
+
+    return created
@@ -1,33 +1,30 @@
-import datetime
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.utils.timezone import make_aware
-from apps.doctors.models import Schedule, WorkingHours
 
-class Command(BaseCommand):
-    help = "Generate working hours for the upcoming week based on schedules"
+from apps.doctors.generators import generate_working_hours
 
-    def handle(self, *args, **kwargs):
-    
-        today = datetime.date.today()
-        week_ahead = today + datetime.timedelta(days=7)
 
-        for schedule in Schedule.objects.all():
-            # Get all dates for the upcoming week's occurrence of this schedule
-            for i in range(7):  # Loop through the next 7 days
-                scheduled_date = today + datetime.timedelta(days=i)
-                
-                # Check if this is the correct weekday for the schedule
-                if scheduled_date.strftime("%a").upper()[:3] == schedule.day:
-                    start_datetime = make_aware(datetime.datetime.combine(scheduled_date, schedule.start_time))
-                    end_datetime = make_aware(datetime.datetime.combine(scheduled_date, schedule.end_time))
+class Command(BaseCommand):
+    help = "Generate working hours for the upcoming days based on schedules"
 
-                    # Avoid duplicate entries
-                    if not WorkingHours.objects.filter(doctor=schedule.doctor, start_time=start_datetime).exists():
-                        WorkingHours.objects.create(
-                            doctor=schedule.doctor,
-                            start_time=start_datetime,
-                            end_time=end_datetime,
-                            patient_left=schedule.max_patients
-                        )
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.WORKING_HOURS_HORIZON_DAYS,
+            help="How many days ahead to generate working hours for",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of doctors processed per batch",
+        )
 
-        self.stdout.write(self.style.SUCCESS("Successfully generated working hours for the next week."))
+    def handle(self, *args, **options):
+        created = generate_working_hours(days=options["days"], chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully generated {created} working hours for the next {options['days']} days."
+            )
+        )
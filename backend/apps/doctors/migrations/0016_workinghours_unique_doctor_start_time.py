@@ -0,0 +1,61 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:21
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_working_hours(apps, schema_editor):
+    """
+    Keep the oldest row of each (doctor, start_time), moving the others' appointments onto it.
+
+    Every duplicate stands for the same slot, so the kept row's capacity is the largest
+    one in the group (a row's seats left plus the appointments holding one) and its
+    ``patient_left`` is that capacity minus all the appointments it now carries.
+    """
+    WorkingHours = apps.get_model('doctors', 'WorkingHours')
+    Appointment = apps.get_model('appointments', 'Appointment')
+
+    duplicates = (
+        WorkingHours.objects.values('doctor_id', 'start_time')
+        .annotate(rows=Count('id'), keep=Min('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates.iterator():
+        rows = list(
+            WorkingHours.objects.filter(doctor_id=group['doctor_id'], start_time=group['start_time'])
+        )
+        # Cancelled appointments gave their seat back
+        booked = dict(
+            Appointment.objects.filter(working_hours__in=rows)
+            .exclude(status='C')
+            .values('working_hours_id')
+            .annotate(count=Count('id'))
+            .values_list('working_hours_id', 'count')
+            .order_by()
+        )
+        capacity = max(row.patient_left + booked.get(row.pk, 0) for row in rows)
+        extra_ids = [row.pk for row in rows if row.pk != group['keep']]
+
+        # Deleting them would cascade to their appointments
+        Appointment.objects.filter(working_hours_id__in=extra_ids).update(working_hours_id=group['keep'])
+        WorkingHours.objects.filter(pk__in=extra_ids).delete()
+        WorkingHours.objects.filter(pk=group['keep']).update(
+            patient_left=max(capacity - sum(booked.values()), 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_appointment_status'),
+        ('doctors', '0015_alter_doctor_is_verified'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_working_hours, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='workinghours',
+            constraint=models.UniqueConstraint(fields=('doctor', 'start_time'), name='unique_doctor_working_hours_start'),
+        ),
+    ]
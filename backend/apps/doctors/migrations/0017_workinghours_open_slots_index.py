@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0016_workinghours_unique_doctor_start_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workinghours',
+            index=models.Index(condition=models.Q(('patient_left__gt', 0), ('status', 'U')), fields=['start_time', 'id'], name='workinghours_open_start_idx'),
+        ),
+    ]
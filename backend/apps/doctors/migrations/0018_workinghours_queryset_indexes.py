@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0017_workinghours_open_slots_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workinghours',
+            index=models.Index(fields=['doctor', 'end_time'], name='workinghours_doctor_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workinghours',
+            index=models.Index(fields=['status', 'end_time'], name='workinghours_status_end_idx'),
+        ),
+    ]
@@ -1,5 +1,10 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Prefetch, Q
 from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
 from django.utils.timezone import now
 
 from model_utils.managers import QueryManager
@@ -46,6 +51,11 @@ class Doctor(models.Model):
         self.clean()  # Calls the clean() method before saving
         super().save(*args, **kwargs)
 
+    @cached_property
+    def upcoming_working_hours(self):
+        """The doctor's next working hours, see ``upcoming_working_hours_prefetch``."""
+        return list(get_upcoming_working_hours().filter(doctor=self)[:settings.DOCTOR_WORKING_HOURS_LIMIT])
+
     def __str__(self):
         return self.user.full_name
 
@@ -99,19 +109,17 @@ class Schedule(models.Model):
         super().save(*args, **kwargs)
 
 
-class WorkingHoursManager(models.Manager):
-    def get_queryset(self):
-        # Get the current time
-        current_time = now()
+class WorkingHoursQuerySet(models.QuerySet):
+    def upcoming(self):
+        """Working hours that haven't ended yet."""
+        return self.filter(end_time__gt=now())
 
-        # Filter the queryset to include only upcoming working hours
-        return (
-            super()
-            .get_queryset()
-            .filter(
-                end_time__gt=current_time,  # end_time should be in the future
-            )
-        )
+    def past(self):
+        return self.filter(end_time__lte=now())
+
+    def in_range(self, start, end):
+        """Working hours starting in ``[start, end)``."""
+        return self.filter(start_time__gte=start, start_time__lt=end)
 
 
 class WorkingHours(models.Model):
@@ -130,10 +138,28 @@ class WorkingHours(models.Model):
     status = models.CharField(
         max_length=3, choices=Status.choices, default=Status.UPCOMING
     )
-    objects = WorkingHoursManager()
+    objects = WorkingHoursQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Working Hours"
+        constraints = [
+            # Also the (doctor, start_time) index behind each doctor's calendar
+            models.UniqueConstraint(
+                fields=["doctor", "start_time"], name="unique_doctor_working_hours_start"
+            ),
+        ]
+        indexes = [
+            # Availability search: bookable slots only, in the order they are returned
+            models.Index(
+                fields=["start_time", "id"],
+                condition=Q(patient_left__gt=0, status="U"),
+                name="workinghours_open_start_idx",
+            ),
+            # A doctor's upcoming() working hours
+            models.Index(fields=["doctor", "end_time"], name="workinghours_doctor_end_idx"),
+            # archive_past_working_hours finds ended rows still marked upcoming
+            models.Index(fields=["status", "end_time"], name="workinghours_status_end_idx"),
+        ]
 
     def clean(self):
         # Ensure start_time is before end_time
@@ -146,3 +172,24 @@ class WorkingHours(models.Model):
         super().save(*args, **kwargs)
 
 
+def get_upcoming_working_hours():
+    """
+    The working hours embedded in doctor payloads: not over yet and starting
+    within ``DOCTOR_WORKING_HOURS_DAYS``. Anything later is paged through the
+    working-hours endpoint.
+    """
+    horizon = now() + timedelta(days=settings.DOCTOR_WORKING_HOURS_DAYS)
+    return WorkingHours.objects.upcoming().filter(start_time__lt=horizon).order_by("start_time", "id")
+
+
+def upcoming_working_hours_prefetch():
+    """
+    Prefetch filling ``Doctor.upcoming_working_hours`` for a whole queryset of
+    doctors, capped at ``DOCTOR_WORKING_HOURS_LIMIT`` rows per doctor.
+    """
+    return Prefetch(
+        "working_hours",
+        # Sliced prefetches are limited per doctor with a window function
+        queryset=get_upcoming_working_hours()[:settings.DOCTOR_WORKING_HOURS_LIMIT],
+        to_attr="upcoming_working_hours",
+    )
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Doctor, Specialty, Schedule, WorkingHours
-from apps.users.serializers import UserSerializer
+from apps.users.pagination import WorkingHoursKeysetPagination
+from apps.users.serializers import UserSerializer, UserCardSerializer
 from apps.reviews.serializers import ReviewSerializer
 
 class WorkingHoursSerializer(serializers.ModelSerializer):
@@ -9,6 +10,18 @@ class WorkingHoursSerializer(serializers.ModelSerializer):
         fields = ["id", "start_time", "end_time", "doctor", "patient_left"]
 
 
+class AvailableSlotSerializer(serializers.ModelSerializer):
+    """An open slot with just enough of its doctor to show in search results."""
+
+    doctor = UserCardSerializer(source="doctor.user", read_only=True)
+    specialty = serializers.CharField(source="doctor.specialty.name", read_only=True, default=None)
+    fees = serializers.DecimalField(source="doctor.fees", max_digits=8, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = WorkingHours
+        fields = ["id", "start_time", "end_time", "patient_left", "doctor", "specialty", "fees"]
+
+
 class ScheduleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Schedule
@@ -26,7 +39,8 @@ class SpecialtySerializer(serializers.ModelSerializer):
 
 
 class DoctorSerializer(serializers.ModelSerializer):
-    working_hours = WorkingHoursSerializer(read_only=True, many=True)
+    working_hours = WorkingHoursSerializer(source="upcoming_working_hours", read_only=True, many=True)
+    working_hours_cursor = serializers.SerializerMethodField()
     user = UserSerializer(many=False)
     reviews = ReviewSerializer(many=True)
     class Meta:
@@ -34,6 +48,7 @@ class DoctorSerializer(serializers.ModelSerializer):
         fields = [
             "user",
             "working_hours",
+            "working_hours_cursor",
             "reviews",
             "fees",
             "user",
@@ -61,12 +76,22 @@ class DoctorSerializer(serializers.ModelSerializer):
 
         if action == "list":
             self.fields.pop("working_hours", None)
+            self.fields.pop("working_hours_cursor", None)
 
         elif action == "detail":
             self.fields["working_hours"] = WorkingHoursSerializer(
-                read_only=True, many=True
+                source="upcoming_working_hours", read_only=True, many=True
             )
 
+    def get_working_hours_cursor(self, obj):
+        """Cursor for the working-hours endpoint to continue after the embedded slots."""
+        if not obj.upcoming_working_hours:
+            return None
+        pagination = WorkingHoursKeysetPagination()
+        return pagination.encode_cursor(
+            pagination.get_position(obj.upcoming_working_hours[-1]), reverse=False
+        )
+
     def update(self, instance, validated_data):
         # Handle nested user updates
         user_data = validated_data.pop("user", None)
@@ -92,8 +117,9 @@ class DoctorSerializer(serializers.ModelSerializer):
         # Check if the request is for a list view
         request = self.context.get("request")
         view = self.context.get("view")
-        if request and view and view.action == "list":
+        if request and view and getattr(view, "action", None) == "list":
             representation.pop("working_hours", None)
+            representation.pop("working_hours_cursor", None)
 
         # Customize the 'specialty' field to display the name of the related Specialty model
         if instance.specialty:  # Ensure specialty is not None
@@ -103,3 +129,25 @@ class DoctorSerializer(serializers.ModelSerializer):
                 None  # Handle the case where specialty is null
             )
         return representation
+
+
+class DoctorListSerializer(serializers.ModelSerializer):
+    """Directory card for a doctor; ratings come from queryset annotations."""
+
+    user = UserCardSerializer(read_only=True)
+    specialty = serializers.CharField(source="specialty.name", read_only=True, default=None)
+    avg_rating = serializers.FloatField(read_only=True)
+    review_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Doctor
+        fields = [
+            "user",
+            "specialty",
+            "fees",
+            "experience",
+            "status",
+            "is_verified",
+            "avg_rating",
+            "review_count",
+        ]
@@ -0,0 +1,59 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.users.models import User
+from apps.users.serializers import UserSerializer
+from apps.reviews.models import Review, Comment
+
+from .models import Doctor, Specialty, WorkingHours
+from . import snapshots
+
+# The user fields a doctor's snapshot fragment carries
+SNAPSHOT_USER_FIELDS = frozenset(UserSerializer.Meta.fields)
+
+
+@receiver(post_save, sender=Doctor)
+def invalidate_doctor_snapshot(sender, instance, created, **kwargs):
+    snapshots.invalidate_doctors(instance.pk, membership=created)
+
+
+@receiver(post_delete, sender=Doctor)
+def invalidate_deleted_doctor_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate_doctors(instance.pk, membership=True)
+
+
+@receiver(post_save, sender=User)
+def invalidate_doctor_user_snapshot(sender, instance, created, update_fields, **kwargs):
+    if created or not instance.is_doctor:
+        return
+    # Partial saves such as the last_login update on every sign-in leave the payload as is
+    if update_fields is not None and not SNAPSHOT_USER_FIELDS & update_fields:
+        return
+    snapshots.invalidate_doctors(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate_doctors(instance.doctor_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate_doctors(instance.review.doctor_id)
+
+
+@receiver(post_save, sender=WorkingHours)
+@receiver(post_delete, sender=WorkingHours)
+def invalidate_working_hours_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate_doctors(instance.doctor_id)
+
+
+@receiver(post_save, sender=Specialty)
+@receiver(post_delete, sender=Specialty)
+def invalidate_specialty_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate_specialties()
+    # Doctors carry the specialty name in their payload
+    doctor_ids = Doctor.objects.filter(specialty=instance).values_list("pk", flat=True)
+    snapshots.invalidate_doctors(*doctor_ids)
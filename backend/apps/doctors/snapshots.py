@@ -0,0 +1,130 @@
+"""
+Prebuilt payload for ``DoctorInitAPIView``.
+
+Every doctor is serialized into its own cache fragment. A write that touches a
+doctor (or its reviews, comments and working hours) drops only that fragment
+and bumps the snapshot version, so the next read re-serializes just the
+doctors that changed and everyone else is served straight from the cache.
+
+Snapshots also roll over every ``DOCTORS_INIT_SNAPSHOT_TIMEOUT`` seconds since
+working hours fall out of the payload as time passes, not only on writes.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+from .models import Doctor, Specialty, upcoming_working_hours_prefetch
+from .serializers import DoctorSerializer, SpecialtySerializer
+
+VERSION_KEY = "doctors:init:version"
+SNAPSHOT_KEY = "doctors:init:snapshot:{version}:{bucket}"
+DOCTOR_IDS_KEY = "doctors:init:doctor-ids:{bucket}"
+DOCTOR_KEY = "doctors:init:doctor:{pk}:{bucket}"
+SPECIALTIES_KEY = "doctors:init:specialties:{bucket}"
+
+
+def _timeout():
+    return settings.DOCTORS_INIT_SNAPSHOT_TIMEOUT
+
+
+def _bucket():
+    return int(time.time() // _timeout())
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a flushed cache never hands out an old ETag again
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_etag():
+    return quote_etag(f"{get_version()}-{_bucket()}")
+
+
+def get_snapshot():
+    """Return ``(etag, payload)`` for the current snapshot, building it if needed."""
+    version, bucket = get_version(), _bucket()
+    key = SNAPSHOT_KEY.format(version=version, bucket=bucket)
+
+    payload = cache.get(key)
+    if payload is None:
+        payload = {
+            "doctors": _get_doctors(bucket),
+            "specialties": _get_specialties(bucket),
+        }
+        cache.set(key, payload, _timeout())
+
+    return quote_etag(f"{version}-{bucket}"), payload
+
+
+def _get_doctors(bucket):
+    ids_key = DOCTOR_IDS_KEY.format(bucket=bucket)
+    doctor_ids = cache.get(ids_key)
+    if doctor_ids is None:
+        doctor_ids = list(Doctor.objects.order_by("pk").values_list("pk", flat=True))
+        cache.set(ids_key, doctor_ids, _timeout())
+
+    keys = {pk: DOCTOR_KEY.format(pk=pk, bucket=bucket) for pk in doctor_ids}
+    fragments = cache.get_many(keys.values())
+
+    missing = [pk for pk, key in keys.items() if key not in fragments]
+    if missing:
+        doctors = list(
+            Doctor.objects.filter(pk__in=missing)
+            .select_related("specialty", "user")
+            .prefetch_related("reviews", "reviews__comments", upcoming_working_hours_prefetch())
+        )
+        data = DoctorSerializer(doctors, many=True).data
+        rebuilt = {keys[doctor.pk]: item for doctor, item in zip(doctors, data)}
+        cache.set_many(rebuilt, _timeout())
+        fragments.update(rebuilt)
+
+    return [fragments[keys[pk]] for pk in doctor_ids if keys[pk] in fragments]
+
+
+def _get_specialties(bucket):
+    key = SPECIALTIES_KEY.format(bucket=bucket)
+    specialties = cache.get(key)
+    if specialties is None:
+        specialties = SpecialtySerializer(Specialty.objects.all(), many=True).data
+        cache.set(key, specialties, _timeout())
+    return specialties
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_version()
+
+
+def invalidate_doctors(*doctor_ids, membership=False):
+    """
+    Drop the fragments of the given doctors once the current transaction commits.
+
+    ``membership`` also drops the doctor id list, for doctors being added or removed.
+    """
+
+    def _invalidate():
+        bucket = _bucket()
+        keys = [DOCTOR_KEY.format(pk=pk, bucket=bucket) for pk in doctor_ids if pk]
+        if membership:
+            keys.append(DOCTOR_IDS_KEY.format(bucket=bucket))
+        cache.delete_many(keys)
+        _bump_version()
+
+    transaction.on_commit(_invalidate)
+
+
+def invalidate_specialties():
+    def _invalidate():
+        cache.delete(SPECIALTIES_KEY.format(bucket=_bucket()))
+        _bump_version()
+
+    transaction.on_commit(_invalidate)
@@ -1,7 +1,33 @@
 from celery import shared_task
-from .management.commands.seed_working_hours import Command
+from django.conf import settings
+from django.utils import timezone
+
+from .generators import generate_working_hours
+from .models import WorkingHours
+
+@shared_task
+def generate_working_hours_task(days=None):
+    return generate_working_hours(days=days)
+
 
 @shared_task
-def generate_working_hours_task():
-    command = Command()
-    command.handle()
+def archive_past_working_hours(batch_size=None):
+    """
+    Marks working hours that have ended as done, a batch at a time, so the
+    upcoming rows the booking and availability queries touch stay a small
+    live window instead of the whole history.
+    """
+    batch_size = batch_size or settings.WORKING_HOURS_ARCHIVE_BATCH_SIZE
+    now = timezone.now()
+    archived = 0
+
+    while True:
+        ids = list(
+            WorkingHours.objects.filter(status=WorkingHours.Status.UPCOMING, end_time__lte=now)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        archived += WorkingHours.objects.filter(pk__in=ids).update(status=WorkingHours.Status.DONE)
+
+    return archived
@@ -1,3 +1,353 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.patients.models import Patient
+from apps.reviews.models import Review, Comment
+from apps.users.models import User
+
+from .generators import generate_working_hours
+from .models import Days, Doctor, Schedule, Specialty, WorkingHours
+from .tasks import archive_past_working_hours
+
+
+class DoctorListTests(TestCase):
+    def setUp(self):
+        specialty = Specialty.objects.create(name="Cardiology", slug="cardiology")
+        patient_user = User.objects.create_user(
+            email="patient@example.com", full_name="Patient", role=User.Roles.PATIENT
+        )
+        patient = Patient.objects.get(user=patient_user)
+
+        for i in range(12):
+            user = User.objects.create_user(
+                email=f"doctor{i}@example.com", full_name=f"Doctor {i}", role=User.Roles.DOCTOR
+            )
+            Doctor.objects.filter(user=user).update(
+                specialty=specialty, status=Doctor.Status.AVAILABLE
+            )
+            review = Review.objects.create(doctor_id=user.pk, patient=patient, rating=i % 5 + 1)
+            Comment.objects.create(review=review, user=patient_user, type="P", content="Thanks")
+
+        self.client = APIClient()
+
+    def list_doctors(self, page_size):
+        return self.client.get("/api/doctors/", {"page_size": page_size})
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        with self.assertNumQueries(2):
+            small = self.list_doctors(page_size=1)
+        with self.assertNumQueries(2):
+            large = self.list_doctors(page_size=10)
+
+        self.assertEqual(len(small.data["results"]), 1)
+        self.assertEqual(len(large.data["results"]), 10)
+
+    def test_list_returns_rating_annotations_instead_of_reviews(self):
+        doctor = self.list_doctors(page_size=1).data["results"][0]
+        review = Review.objects.get(doctor_id=doctor["user"]["id"])
+
+        self.assertNotIn("reviews", doctor)
+        self.assertEqual(doctor["specialty"], "Cardiology")
+        self.assertEqual(doctor["review_count"], 1)
+        self.assertEqual(doctor["avg_rating"], review.rating)
+        self.assertEqual(set(doctor["user"]), {"id", "full_name", "image"})
+
+    def test_list_sorts_and_filters_by_rating(self):
+        response = self.client.get("/api/doctors/", {"ordering": "-rating", "min_rating": 4})
+        ratings = [doctor["avg_rating"] for doctor in response.data["results"]]
+
+        self.assertEqual(ratings, sorted(ratings, reverse=True))
+        self.assertTrue(ratings)
+        self.assertTrue(all(rating >= 4 for rating in ratings))
+
+    def test_detail_includes_reviews(self):
+        doctor = Doctor.objects.first()
+
+        response = self.client.get(f"/api/doctors/{doctor.pk}/")
+
+        self.assertEqual(len(response.data["reviews"]), 1)
+        self.assertEqual(len(response.data["reviews"][0]["comments"]), 1)
+
+
+class GenerateWorkingHoursTests(TestCase):
+    def setUp(self):
+        self.doctors = []
+        for i in range(3):
+            user = User.objects.create_user(
+                email=f"doctor{i}@example.com", full_name=f"Doctor {i}", role=User.Roles.DOCTOR
+            )
+            doctor = Doctor.objects.get(user=user)
+            Schedule.objects.bulk_create(
+                Schedule(
+                    doctor=doctor,
+                    day=day,
+                    start_time=datetime.time(9),
+                    end_time=datetime.time(12),
+                    max_patients=3,
+                )
+                for day in Days
+            )
+            self.doctors.append(doctor)
+
+    def test_creates_a_slot_per_schedule_day_in_chunks(self):
+        with mock.patch.object(
+            WorkingHours.objects, "bulk_create", wraps=WorkingHours.objects.bulk_create
+        ) as bulk_create:
+            created = generate_working_hours(days=7, chunk_size=2)
+
+        self.assertEqual(created, 21)
+        self.assertEqual(WorkingHours.objects.count(), 21)
+        self.assertEqual(set(WorkingHours.objects.values_list("patient_left", flat=True)), {3})
+        # One insert per chunk of doctors, tolerating rows created meanwhile
+        self.assertEqual(bulk_create.call_count, 2)
+        for call in bulk_create.call_args_list:
+            self.assertTrue(call.kwargs["ignore_conflicts"])
+
+    def test_second_run_creates_nothing(self):
+        generate_working_hours(days=7, chunk_size=2)
+
+        with mock.patch.object(WorkingHours.objects, "bulk_create") as bulk_create:
+            self.assertEqual(generate_working_hours(days=7, chunk_size=2), 0)
+
+        bulk_create.assert_not_called()
+        self.assertEqual(WorkingHours.objects.count(), 21)
+
+    def test_conflicting_rows_are_skipped(self):
+        bulk_create = WorkingHours.objects.bulk_create
+
+        def insert_one_first(working_hours, **kwargs):
+            # Another worker wins the race for the first slot
+            WorkingHours.objects.create(
+                doctor_id=working_hours[0].doctor_id,
+                start_time=working_hours[0].start_time,
+                end_time=working_hours[0].end_time,
+            )
+            return bulk_create(working_hours, **kwargs)
+
+        with mock.patch.object(WorkingHours.objects, "bulk_create", side_effect=insert_one_first):
+            generate_working_hours(days=7, chunk_size=2)
+
+        self.assertEqual(WorkingHours.objects.count(), 21)
+        self.assertEqual(generate_working_hours(days=7, chunk_size=2), 0)
+
+
+class DoctorInitSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.users = [
+            User.objects.create_user(
+                email=f"doctor{i}@example.com", full_name=f"Doctor {i}", role=User.Roles.DOCTOR
+            )
+            for i in range(2)
+        ]
+        self.client = APIClient()
+
+    def init(self, **headers):
+        return self.client.get("/api/doctors/init/", headers=headers)
+
+    def test_matching_etag_gets_not_modified(self):
+        response = self.init()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["doctors"]), 2)
+        not_modified = self.init(if_none_match=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+    def test_login_does_not_invalidate_the_snapshot(self):
+        before = self.init()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.users[0])
+
+        self.assertEqual(self.init(if_none_match=before["ETag"]).status_code, 304)
+
+    def test_profile_change_rebuilds_only_that_doctor(self):
+        before = self.init()
+        user = self.users[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.full_name = "Renamed"
+            user.save(update_fields=["full_name"])
+
+        # Doctor, reviews and working hours of the changed doctor only
+        with self.assertNumQueries(3):
+            after = self.init(if_none_match=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        names = {doctor["user"]["id"]: doctor["user"]["full_name"] for doctor in after.data["doctors"]}
+        self.assertEqual(names, {str(user.pk): "Renamed", str(self.users[1].pk): "Doctor 1"})
+
+
+class AvailabilitySearchTests(TestCase):
+    def setUp(self):
+        cardiology = Specialty.objects.create(name="Cardiology", slug="cardiology")
+        dermatology = Specialty.objects.create(name="Dermatology", slug="dermatology")
+        self.start = timezone.now() + datetime.timedelta(days=1)
+
+        self.cardiologist = self.create_doctor("cardio", cardiology, fees=100)
+        self.dermatologist = self.create_doctor("derma", dermatology, fees=300)
+        away = self.create_doctor("away", cardiology, fees=50, status=Doctor.Status.UNAVAILABLE)
+
+        self.open = [
+            self.create_slot(self.cardiologist, hours=0),
+            self.create_slot(self.dermatologist, hours=1),
+            self.create_slot(self.cardiologist, hours=2),
+        ]
+        self.full = self.create_slot(self.dermatologist, hours=3, patient_left=0)
+        self.create_slot(self.cardiologist, hours=-48)
+        self.create_slot(self.cardiologist, hours=4, status=WorkingHours.Status.CANCELED)
+        self.create_slot(away, hours=5)
+
+        self.client = APIClient()
+
+    def create_doctor(self, name, specialty, fees, status=Doctor.Status.AVAILABLE):
+        user = User.objects.create_user(
+            email=f"{name}@example.com", full_name=name, role=User.Roles.DOCTOR
+        )
+        Doctor.objects.filter(user=user).update(specialty=specialty, fees=fees, status=status)
+        return Doctor.objects.get(user=user)
+
+    def create_slot(self, doctor, hours, **kwargs):
+        start_time = self.start + datetime.timedelta(hours=hours)
+        return WorkingHours.objects.create(
+            doctor=doctor,
+            start_time=start_time,
+            end_time=start_time + datetime.timedelta(minutes=30),
+            **kwargs,
+        )
+
+    def search(self, **params):
+        return self.client.get("/api/availability/", params)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return [slot["id"] for slot in response.data["results"]]
+
+    def test_lists_open_slots_of_available_doctors_by_start_time(self):
+        response = self.search()
+
+        self.assertEqual(self.ids(response), [slot.pk for slot in self.open])
+        self.assertEqual(response.data["results"][0]["specialty"], "Cardiology")
+        self.assertEqual(response.data["results"][0]["fees"], "100.00")
+
+    def test_has_capacity_false_includes_full_slots(self):
+        self.assertEqual(
+            self.ids(self.search(has_capacity="false")), [slot.pk for slot in self.open] + [self.full.pk]
+        )
+
+    def test_filters_by_specialty_fees_and_start(self):
+        self.assertEqual(
+            self.ids(self.search(specialty="cardiology")), [self.open[0].pk, self.open[2].pk]
+        )
+        self.assertEqual(
+            self.ids(self.search(max_fees=200)), [self.open[0].pk, self.open[2].pk]
+        )
+        start_from = (self.start + datetime.timedelta(minutes=30)).isoformat()
+        self.assertEqual(
+            self.ids(self.search(start_from=start_from)), [self.open[1].pk, self.open[2].pk]
+        )
+
+    def test_bad_start_from_is_rejected(self):
+        response = self.search(start_from="tomorrow")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("start_from", response.data)
+
+    def test_pages_by_cursor_in_a_single_query(self):
+        with self.assertNumQueries(1):
+            first = self.search(page_size=2)
+        with self.assertNumQueries(1):
+            second = self.search(page_size=2, cursor=first.data["next"])
+
+        self.assertEqual(self.ids(first), [self.open[0].pk, self.open[1].pk])
+        self.assertEqual(self.ids(second), [self.open[2].pk])
+        self.assertEqual(second.data["next"], -1)
+        self.assertIsNone(first.data["count"])
+
+
+class ArchivePastWorkingHoursTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email="doctor@example.com", full_name="Doctor", role=User.Roles.DOCTOR
+        )
+        self.doctor = Doctor.objects.get(user=user)
+        self.now = timezone.now()
+
+    def create_slot(self, ends_in, status=WorkingHours.Status.UPCOMING):
+        end_time = self.now + ends_in
+        return WorkingHours.objects.create(
+            doctor=self.doctor,
+            start_time=end_time - datetime.timedelta(minutes=30),
+            end_time=end_time,
+            status=status,
+        )
+
+    def test_marks_ended_upcoming_slots_done_in_batches(self):
+        ended = [self.create_slot(datetime.timedelta(hours=-hours)) for hours in range(1, 4)]
+        cancelled = self.create_slot(datetime.timedelta(hours=-5), status=WorkingHours.Status.CANCELED)
+        running = self.create_slot(datetime.timedelta(minutes=10))
+
+        # A select and an update per batch of 2, then the select that finds nothing left
+        with self.assertNumQueries(5):
+            archived = archive_past_working_hours(batch_size=2)
+
+        self.assertEqual(archived, 3)
+        statuses = dict(WorkingHours.objects.values_list("pk", "status"))
+        self.assertEqual({statuses[slot.pk] for slot in ended}, {WorkingHours.Status.DONE})
+        self.assertEqual(statuses[cancelled.pk], WorkingHours.Status.CANCELED)
+        self.assertEqual(statuses[running.pk], WorkingHours.Status.UPCOMING)
+        self.assertEqual(archive_past_working_hours(batch_size=2), 0)
+
+
+class DoctorDetailWorkingHoursTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email="doctor@example.com", full_name="Doctor", role=User.Roles.DOCTOR
+        )
+        Doctor.objects.filter(user=user).update(status=Doctor.Status.AVAILABLE)
+        self.doctor = Doctor.objects.get(user=user)
+        patient_user = User.objects.create_user(
+            email="patient@example.com", full_name="Patient", role=User.Roles.PATIENT
+        )
+        review = Review.objects.create(
+            doctor=self.doctor, patient=Patient.objects.get(user=patient_user), rating=5
+        )
+        Comment.objects.create(review=review, user=patient_user, type="P", content="Thanks")
+
+        start = timezone.now() + datetime.timedelta(hours=1)
+        WorkingHours.objects.bulk_create(
+            WorkingHours(
+                doctor=self.doctor,
+                start_time=start + datetime.timedelta(hours=i),
+                end_time=start + datetime.timedelta(hours=i, minutes=30),
+            )
+            for i in range(60)
+        )
+        self.slot_ids = list(
+            WorkingHours.objects.order_by("start_time", "id").values_list("pk", flat=True)
+        )
+        self.client = APIClient()
+
+    def test_detail_embeds_the_first_slots_and_a_cursor_for_the_rest(self):
+        # Doctor, reviews, comments and the capped working hours prefetch
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/api/doctors/{self.doctor.pk}/")
+
+        self.assertEqual(response.status_code, 200)
+        embedded = [slot["id"] for slot in response.data["working_hours"]]
+        self.assertEqual(embedded, self.slot_ids[:50])
 
-# Create your tests here.
+        rest = self.client.get(
+            f"/api/doctors/{self.doctor.pk}/working-hours/",
+            {"cursor": response.data["working_hours_cursor"], "page_size": 20},
+        )
+        self.assertEqual([slot["id"] for slot in rest.data["results"]], self.slot_ids[50:])
+        self.assertEqual(rest.data["next"], -1)
@@ -5,6 +5,7 @@ from .views import (
     SpecialtyListAPIView,
     DoctorInitAPIView,
     DashboardDataAPIView,
+    AvailabilitySearchAPIView,
 )
 from rest_framework_nested.routers import NestedSimpleRouter
 from rest_framework.routers import DefaultRouter
@@ -32,4 +33,5 @@ doctor_routes = [
     path("", include(router.urls)),
     path("", include(nested_router.urls)), 
     path("specialties/", SpecialtyListAPIView.as_view()),
+    path("availability/", AvailabilitySearchAPIView.as_view(), name="availability-search"),
 ]
@@ -1,11 +1,12 @@
-from django.db.models import Sum, Count
+from django.db.models import F, Sum, Count, Q
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from apps.patients.models import Patient
 from django.core.exceptions import ValidationError
+from django.utils.http import parse_etags
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import views
@@ -18,14 +19,18 @@ from rest_framework import status
 from rest_framework.decorators import action
 
 from apps.appointments.serializers import AppointmentSerializer
-from apps.appointments.models import Appointment
+from apps.appointments.models import Appointment, DoctorStats
 from apps.reviews.models import Review
+from apps.users.pagination import AvailabilityPagination, WorkingHoursKeysetPagination
 
-from .models import Doctor, Schedule, WorkingHours, Specialty
+from .models import Doctor, Schedule, WorkingHours, Specialty, upcoming_working_hours_prefetch
 from .permissions import IsOwnerOrReadOnly, IsDoctor
-from .filters import DoctorFilter
+from .filters import AvailabilityFilter, DoctorFilter
+from . import snapshots
 from .serializers import (
+    AvailableSlotSerializer,
     DoctorSerializer,
+    DoctorListSerializer,
     ScheduleSerializer,
     WorkingHoursSerializer,
     SpecialtySerializer,
@@ -45,14 +50,23 @@ class DoctorViewSets(viewsets.ReadOnlyModelViewSet):
     filterset_class = DoctorFilter
 
     def get_queryset(self):
-        queryset = Doctor.available.all()
+        queryset = Doctor.available.select_related("user", "specialty")
 
         if self.action == "list":
-            queryset = queryset.select_related("user", "specialty")
-        elif self.action == "detail":
-            queryset = queryset.select_related("user", "specialty", "working_hours")
+            # Ratings come from the aggregates maintained on review writes, joined in the same query
+            queryset = queryset.annotate(
+                avg_rating=F("rating__rating_avg"),
+                review_count=Coalesce("rating__rating_count", 0),
+            ).order_by("pk")
+        elif self.action == "retrieve":
+            queryset = queryset.prefetch_related("reviews__comments", upcoming_working_hours_prefetch())
         return queryset
 
+    def get_serializer_class(self):
+        if self.action == "list":
+            return DoctorListSerializer
+        return super().get_serializer_class()
+
     @action(detail=False, methods=["get"])
     def dashboard(self, request, pk=None):
         try:
@@ -61,23 +75,17 @@ class DoctorViewSets(viewsets.ReadOnlyModelViewSet):
             return Response(
                 {"error": "Doctor does not exist"}, status=status.HTTP_404_NOT_FOUND
             )
-        appointments = Appointment.objects.filter(doctor=doctor).select_related(
-            "working_hours"
+        stats = DoctorStats.objects.filter(doctor=doctor).first() or DoctorStats(doctor=doctor)
+        latest_appointment = (
+            Appointment.objects.filter(doctor=doctor)
+            .select_related("working_hours")
+            .order_by("-working_hours__start_time")[:10]
         )
-        total_appointments = appointments.count()
-        total_earning = appointments.aggregate(total_earnings=Sum("fees"))[
-            "total_earnings"
-        ]
-
-        total_patient = appointments.aggregate(
-            total_patients=Count("patient", distinct=True)
-        )["total_patients"]
-        latest_appointment = appointments.order_by("-working_hours__start_time")[:10]
 
         dashboard_data = {
-            "total_earnings": total_earning,
-            "total_patients": total_patient,
-            "total_appointments": total_appointments,
+            "total_earnings": stats.total_earnings,
+            "total_patients": stats.total_patients,
+            "total_appointments": stats.total_appointments,
             "latest_appointments": AppointmentSerializer(
                 latest_appointment, context={"request": self.request}, many=True
             ).data,
@@ -117,9 +125,10 @@ class ScheduleViewSet(viewsets.ModelViewSet):
 
 class WorkingHoursViewSet(viewsets.ModelViewSet):
     serializer_class = WorkingHoursSerializer
+    pagination_class = WorkingHoursKeysetPagination
 
     def get_queryset(self):
-        qs = WorkingHours.objects.all()
+        qs = WorkingHours.objects.upcoming().order_by("start_time", "id")
         doctor_pk = self.kwargs.get("doctor_pk")
         if doctor_pk:
             return qs.filter(doctor_id=doctor_pk)
@@ -127,25 +136,40 @@ class WorkingHoursViewSet(viewsets.ModelViewSet):
         return qs
 
 
+class AvailabilitySearchAPIView(generics.ListAPIView):
+    """
+    Earliest open slots across all available doctors, e.g. "the next free
+    cardiologist" with ``?specialty=cardiology&page_size=1``.
+
+    Ordered by start time and paged by keyset only, so each page is one seek
+    on the partial index over bookable slots.
+    """
+    serializer_class = AvailableSlotSerializer
+    pagination_class = AvailabilityPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AvailabilityFilter
+
+    def get_queryset(self):
+        return WorkingHours.objects.filter(
+            status=WorkingHours.Status.UPCOMING,
+            start_time__gt=timezone.now(),
+            doctor__status=Doctor.Status.AVAILABLE,
+        ).select_related("doctor__user", "doctor__specialty")
+
+
 class DoctorInitAPIView(views.APIView):
     # permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        doctors = Doctor.objects.select_related("specialty", "user").prefetch_related(
-            "reviews", "reviews__comments", "working_hours"
-        )
-        specialties = Specialty.objects.all()
-        # Initialize the response data
-        #
-        doctors_data = DoctorSerializer(doctors, many=True).data
-        specialties_data = SpecialtySerializer(specialties, many=True).data
-
-        response_data = {
-            "doctors": doctors_data,
-            "specialties": specialties_data,
-        }
+        # Clients already holding the current snapshot get a 304 without it being loaded
+        etag = snapshots.get_etag()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-        return Response(response_data)
+        etag, response_data = snapshots.get_snapshot()
+        headers["ETag"] = etag
+        return Response(response_data, headers=headers)
 
 
 # dashboard/views.py
@@ -153,26 +177,53 @@ class DoctorInitAPIView(views.APIView):
 
 class DashboardDataAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    default_months = 3
+    max_months = 36
+
+    def get_months(self):
+        try:
+            months = int(self.request.query_params.get("months", self.default_months))
+        except ValueError:
+            months = self.default_months
+        return min(max(months, 1), self.max_months)
 
     def get(self, request):
-        today = datetime.today()
-        # last three months including current
-        months = [(today - relativedelta(months=i)).month for i in range(2, -1, -1)]
-        years = [(today - relativedelta(months=i)).year for i in range(2, -1, -1)]
-
-        # Earnings per month (last 3 months)
-        earnings_per_month = []
-        for m, y in zip(months, years):
-            total = (
-                Appointment.objects.filter(
-                    doctor_id=request.user.id,
-                    created_at__year=y,
-                    created_at__month=m,
-                    status=Appointment.Status.PAID,
-                ).aggregate(total=Sum("fees"))["total"]
-                or 0
+        months = self.get_months()
+        this_month = timezone.localtime().replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        month_starts = [
+            this_month - relativedelta(months=i) for i in range(months - 1, -1, -1)
+        ]
+
+        appointments = Appointment.objects.filter(doctor_id=request.user.id)
+
+        # Earnings and appointment counts for every month of the window in one grouped query
+        rows = (
+            appointments.filter(created_at__gte=month_starts[0])
+            .annotate(month=TruncMonth("created_at"))
+            .values("month")
+            .annotate(
+                earnings=Sum("fees", filter=Q(status=Appointment.Status.PAID)),
+                appointments=Count("id"),
             )
-            earnings_per_month.append(total)
+            .order_by("month")
+        )
+        per_month = {(row["month"].year, row["month"].month): row for row in rows}
+
+        monthly = []
+        for start in month_starts:
+            row = per_month.get((start.year, start.month), {})
+            monthly.append(
+                {
+                    "month": start.strftime("%Y-%m"),
+                    "earnings": row.get("earnings") or 0,
+                    "appointments": row.get("appointments") or 0,
+                }
+            )
+
+        earnings_per_month = [month["earnings"] for month in monthly]
+        appointments_per_month = [month["appointments"] for month in monthly]
 
         # Trend calculation for earnings
         trend_earnings = 0
@@ -182,30 +233,28 @@ class DashboardDataAPIView(APIView):
                 / earnings_per_month[-2]
             ) * 100
 
-        # Total patients
-        total_patients = Patient.objects.count()
-
-        # Total appointments this month
-        total_appointments = Appointment.objects.filter(
-            created_at__month=today.month, created_at__year=today.year
-        ).count()
+        # Patients this doctor has ever seen, from the maintained rollup
+        total_patients = (
+            DoctorStats.objects.filter(doctor_id=request.user.id)
+            .values_list("total_patients", flat=True)
+            .first()
+            or 0
+        )
 
         # Appointments trend
-        appointments_last_month = Appointment.objects.filter(
-            created_at__month=(today - relativedelta(months=1)).month,
-            created_at__year=(today - relativedelta(months=1)).year,
-        ).count()
         trend_appointments = 0
-        if appointments_last_month != 0:
+        if len(appointments_per_month) >= 2 and appointments_per_month[-2] != 0:
             trend_appointments = (
-                (total_appointments - appointments_last_month) / appointments_last_month
+                (appointments_per_month[-1] - appointments_per_month[-2])
+                / appointments_per_month[-2]
             ) * 100
 
         data = {
             "total_earnings": earnings_per_month[-1],
             "earnings_trend": round(trend_earnings, 2),
             "total_patients": total_patients,
-            "total_appointments": total_appointments,
+            "total_appointments": appointments_per_month[-1],
             "appointments_trend": round(trend_appointments, 2),
+            "months": monthly,
         }
         return Response(data)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Review, Comment
+from .models import Review, Comment, DoctorRating
 
 
 @admin.register(Review)
@@ -12,3 +12,11 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ('id', 'review', 'user')
     list_filter = ('review', 'user')
 
+
+@admin.register(DoctorRating)
+class DoctorRatingAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'rating_avg', 'rating_count', 'updated_at')
+    readonly_fields = (
+        'rating_avg', 'rating_count', 'rating_sum',
+        'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5', 'updated_at',
+    )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.reviews.models import DoctorRating
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-doctor rating aggregates from the reviews table"
+
+    def handle(self, *args, **options):
+        ratings = DoctorRating.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {len(ratings)} doctor(s)."))
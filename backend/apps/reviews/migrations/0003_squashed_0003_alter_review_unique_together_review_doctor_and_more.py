@@ -0,0 +1,35 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # 0003 sets unique_together on review.doctor before adding the field, so it
+    # cannot be applied to an empty database. Fresh databases run this
+    # replacement instead; databases that already applied 0003 treat it as
+    # applied. The resulting schema is the same either way.
+
+    replaces = [
+        ('reviews', '0003_alter_review_unique_together_review_doctor_and_more'),
+    ]
+
+    dependencies = [
+        ('doctors', '0015_alter_doctor_is_verified'),
+        ('patients', '0003_rename_title_patientfile_name_patientfile_updated_at'),
+        ('reviews', '0002_alter_comment_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='doctor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='doctors.doctor'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='review',
+            unique_together={('doctor', 'patient')},
+        ),
+        migrations.RemoveField(
+            model_name='review',
+            name='appointment',
+        ),
+    ]
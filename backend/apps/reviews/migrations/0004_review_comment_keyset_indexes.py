@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0016_workinghours_unique_doctor_start_time'),
+        ('patients', '0003_rename_title_patientfile_name_patientfile_updated_at'),
+        ('reviews', '0003_alter_review_unique_together_review_doctor_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['review', 'created_at', 'id'], name='reviews_com_review__707f8d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['doctor', 'created_at', 'id'], name='reviews_rev_doctor__b22017_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count, Q, Sum
+
+
+def build_ratings(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    DoctorRating = apps.get_model('reviews', 'DoctorRating')
+    rows = (
+        Review.objects.filter(doctor__isnull=False)
+        .values('doctor_id')
+        .annotate(
+            rating_count=Count('id'),
+            rating_sum=Sum('rating'),
+            rating_avg=Avg('rating'),
+            **{f'stars_{rating}': Count('id', filter=Q(rating=rating)) for rating in range(1, 6)},
+        )
+        .order_by()
+    )
+    DoctorRating.objects.bulk_create(DoctorRating(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0018_workinghours_queryset_indexes'),
+        ('reviews', '0004_review_comment_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorRating',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='doctors.doctor')),
+                ('rating_avg', models.FloatField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-rating_avg', '-rating_count'], name='doctorrating_avg_count_idx'), models.Index(fields=['-rating_count'], name='doctorrating_count_idx')],
+            },
+        ),
+        migrations.RunPython(build_ratings, migrations.RunPython.noop),
+    ]
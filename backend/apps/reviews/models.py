@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
 from apps.appointments.models import Appointment
 from apps.doctors.models import Doctor
 from apps.core.models import AuditableModel
@@ -26,8 +29,17 @@ class Review(AuditableModel):
     def __str__(self):
         return f"Review by {self.patient} for {self.doctor}"
 
+    def save(self, *args, **kwargs):
+        # The rating aggregates are updated by signals, inside the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ('doctor', 'patient')
+        indexes = [
+            # Keyset pagination of a doctor's reviews
+            models.Index(fields=['doctor', 'created_at', 'id']),
+        ]
 
 
 class Comment(AuditableModel):
@@ -43,5 +55,105 @@ class Comment(AuditableModel):
     
     def __str__(self):
         return f"Comment by {self.user} on Review {self.review.id}"
-    
-    
\ No newline at end of file
+
+    class Meta(AuditableModel.Meta):
+        indexes = AuditableModel.Meta.indexes + [
+            # Keyset pagination of a review's comments
+            models.Index(fields=['review', 'created_at', 'id']),
+        ]
+
+
+class DoctorRatingManager(models.Manager):
+    def record_change(self, previous, current):
+        """
+        Move a review's rating between aggregates.
+
+        ``previous`` and ``current`` are ``(doctor_id, rating)`` pairs, or
+        ``None`` for a review that is being created or deleted.
+        """
+        if previous == current:
+            return
+        if previous and previous[0]:
+            self._apply(previous[0], previous[1], -1)
+        if current and current[0]:
+            self._apply(current[0], current[1], 1)
+
+    def _apply(self, doctor_id, rating, delta):
+        values = {
+            'rating_count': F('rating_count') + delta,
+            'rating_sum': F('rating_sum') + delta * rating,
+            f'stars_{rating}': F(f'stars_{rating}') + delta,
+            'updated_at': timezone.now(),
+        }
+        rows = self.filter(doctor_id=doctor_id)
+
+        if not rows.update(**values):
+            if delta < 0:
+                return
+            # First review for this doctor
+            self.get_or_create(doctor_id=doctor_id)
+            rows.update(**values)
+
+        # Recomputed from the updated totals, so concurrent writers can't leave a stale average
+        rows.filter(rating_count__gt=0).update(
+            rating_avg=Cast('rating_sum', FloatField()) / F('rating_count')
+        )
+        # A doctor without reviews has no row, just like one that was never reviewed
+        rows.filter(rating_count__lte=0).delete()
+
+    def rebuild(self):
+        """Recompute every doctor's rating aggregates from the reviews table."""
+        stars = {
+            f'stars_{rating}': Count('id', filter=Q(rating=rating))
+            for rating in Review.RatingChoices.values
+        }
+        rows = (
+            Review.objects.filter(doctor__isnull=False)
+            .values('doctor_id')
+            .annotate(
+                rating_count=Count('id'),
+                rating_sum=Sum('rating'),
+                rating_avg=Avg('rating'),
+                **stars,
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            self.all().delete()
+            return self.bulk_create(self.model(**row) for row in rows)
+
+
+class DoctorRating(models.Model):
+    """Rating average, count and star histogram of a doctor, kept up to date as reviews are written."""
+
+    doctor = models.OneToOneField(
+        Doctor,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating',
+    )
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DoctorRatingManager()
+
+    class Meta:
+        indexes = [
+            # Doctor list sorted and filtered by rating
+            models.Index(fields=['-rating_avg', '-rating_count'], name='doctorrating_avg_count_idx'),
+            models.Index(fields=['-rating_count'], name='doctorrating_count_idx'),
+        ]
+
+    def __str__(self):
+        return f'Rating of {self.doctor}'
+
+    @property
+    def histogram(self):
+        return {rating: getattr(self, f'stars_{rating}') for rating in Review.RatingChoices.values}
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import DoctorRating, Review
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('doctor_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_doctor_rating(sender, instance, **kwargs):
+    DoctorRating.objects.record_change(
+        getattr(instance, '_previous_rating', None), (instance.doctor_id, instance.rating)
+    )
+
+
+@receiver(post_delete, sender=Review)
+def remove_doctor_rating(sender, instance, **kwargs):
+    DoctorRating.objects.record_change((instance.doctor_id, instance.rating), None)
@@ -1,3 +1,60 @@
 from django.test import TestCase
 
-# Create your tests here.
+from apps.doctors.models import Doctor
+from apps.patients.models import Patient
+from apps.users.models import User
+
+from .models import DoctorRating, Review
+
+
+class DoctorRatingTests(TestCase):
+    def setUp(self):
+        self.doctors = [
+            Doctor.objects.get(user=User.objects.create_user(
+                email=f"doctor{i}@example.com", full_name=f"Doctor {i}", role=User.Roles.DOCTOR
+            ))
+            for i in range(2)
+        ]
+        self.patients = [
+            Patient.objects.get(user=User.objects.create_user(
+                email=f"patient{i}@example.com", full_name=f"Patient {i}", role=User.Roles.PATIENT
+            ))
+            for i in range(2)
+        ]
+
+    def rating(self, doctor):
+        return DoctorRating.objects.get(doctor=doctor)
+
+    def test_review_writes_keep_aggregates_up_to_date(self):
+        doctor = self.doctors[0]
+        first = Review.objects.create(doctor=doctor, patient=self.patients[0], rating=5)
+        second = Review.objects.create(doctor=doctor, patient=self.patients[1], rating=2)
+
+        rating = self.rating(doctor)
+        self.assertEqual(rating.rating_count, 2)
+        self.assertEqual(rating.rating_avg, 3.5)
+        self.assertEqual(rating.histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        second.rating = 3
+        second.save()
+        rating = self.rating(doctor)
+        self.assertEqual(rating.rating_avg, 4.0)
+        self.assertEqual(rating.histogram, {1: 0, 2: 0, 3: 1, 4: 0, 5: 1})
+
+        first.delete()
+        second.delete()
+        self.assertFalse(DoctorRating.objects.filter(doctor=doctor).exists())
+
+    def test_rebuild_matches_incremental_aggregates(self):
+        Review.objects.create(doctor=self.doctors[0], patient=self.patients[0], rating=4)
+        Review.objects.create(doctor=self.doctors[0], patient=self.patients[1], rating=1)
+        Review.objects.create(doctor=self.doctors[1], patient=self.patients[0], rating=5)
+        expected = list(DoctorRating.objects.order_by("pk").values())
+
+        DoctorRating.objects.all().delete()
+        DoctorRating.objects.rebuild()
+
+        rebuilt = list(DoctorRating.objects.order_by("pk").values())
+        for row in expected + rebuilt:
+            row.pop("updated_at")
+        self.assertEqual(rebuilt, expected)
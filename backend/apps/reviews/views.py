@@ -8,11 +8,13 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.exceptions import NotFound
 
 from apps.doctors.models import Doctor
+from apps.users.pagination import KeysetPagination
 
 class ReviewsViewSet(ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsReviewOwnerOrReadOnly]
+    pagination_class = KeysetPagination
 
     
     def get_queryset(self):
@@ -39,6 +41,7 @@ class CommentsViewSet(ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsCommentOwner]
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         review_id = self.kwargs.get("review_pk")
@@ -1,3 +1,10 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
@@ -18,3 +25,149 @@ class CustomPageNumberPagination(PageNumberPagination):
             'next': self.page.next_page_number() if self.page.has_next() else -1,
             'results': data
         })
+
+
+class KeysetPagination(CustomPageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset mode.
+
+    Sending ``?cursor=`` (empty for the first page) switches to keyset paging:
+    rows are ordered by ``ordering`` and each page seeks past the last row of
+    the previous one instead of using OFFSET, and ``COUNT(*)`` only runs when
+    ``?count=true`` is also given. ``next``/``previous`` hold opaque cursors,
+    or ``-1`` when there is no such page. Without ``cursor`` the endpoint
+    behaves exactly like ``CustomPageNumberPagination``, unless
+    ``allow_page_numbers`` is off and keyset paging is the only mode.
+    """
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    allow_page_numbers = True
+
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.allow_page_numbers and self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = queryset.count() if self.wants_count(request) else None
+
+        fields = [self.resolve_field(queryset.model, name) for name in self.ordering]
+        position, reverse = self.decode_cursor(request, len(fields))
+        if reverse:
+            fields = [(name, not descending, nullable) for name, descending, nullable in fields]
+
+        queryset = queryset.order_by(*self.get_order_by(fields))
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_seek_filter(fields, position))
+            except (ValidationError, TypeError, ValueError):
+                # A well-formed cursor carrying values the fields can't take
+                raise NotFound('Invalid cursor')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Going back always leaves a page behind us, and vice versa
+        has_next = has_more if not reverse else position is not None
+        has_previous = has_more if reverse else position is not None
+
+        self.next_position = self.get_position(rows[-1]) if rows and has_next else None
+        self.previous_position = self.get_position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        return Response({
+            'count': self.count,
+            'page_size': self.page_size,
+            'previous': self.encode_cursor(self.previous_position, reverse=True),
+            'next': self.encode_cursor(self.next_position, reverse=False),
+            'results': data
+        })
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def resolve_field(model, name):
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        return name, descending, model._meta.get_field(name).null
+
+    @staticmethod
+    def get_order_by(fields):
+        order_by = []
+        for name, descending, nullable in fields:
+            if not nullable:
+                order_by.append(F(name).desc() if descending else F(name).asc())
+            elif descending:
+                # Pin NULLs to a known end on every backend so the seek filter stays valid
+                order_by.append(F(name).desc(nulls_last=True))
+            else:
+                order_by.append(F(name).asc(nulls_first=True))
+        return order_by
+
+    @staticmethod
+    def get_seek_filter(fields, position):
+        """Rows strictly after ``position`` in lexicographic ``fields`` order."""
+        seek = Q(pk__in=[])
+        equal = Q()
+        for (name, descending, nullable), value in zip(fields, position):
+            nulls_last = nullable and descending
+            nulls_first = nullable and not descending
+            if value is None:
+                after = Q(**{f'{name}__isnull': False}) if nulls_first else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+                if nulls_last:
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            seek |= equal & after
+            equal &= same
+        return seek
+
+    def get_position(self, instance):
+        position = []
+        for name in self.ordering:
+            value = getattr(instance, name.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return -1
+        payload = json.dumps({'p': position, 'r': reverse}, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, length):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != length:
+            raise NotFound('Invalid cursor')
+        return position, reverse
+
+
+class WorkingHoursKeysetPagination(KeysetPagination):
+    # Working hours are browsed by when they happen, not when they were created
+    ordering = ('start_time', 'id')
+
+
+class AvailabilityPagination(WorkingHoursKeysetPagination):
+    # Searches over every doctor's calendar only ever seek, never OFFSET
+    allow_page_numbers = False
@@ -10,3 +10,8 @@ class UserSerializer(serializers.ModelSerializer):
             'email': {'read_only':True}
         }
 
+
+class UserCardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'full_name', 'image')
@@ -1,7 +1,12 @@
+from django.conf import settings
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from apps.authn.tokens import email_verification_token
 from apps.doctors.models import Doctor
 from apps.patients.models import Patient
+from apps.core.events import publish, subscribe
 from .tasks import send_email_template
 from .models import User
 
@@ -18,26 +23,44 @@ def create_profile(sender, instance, created, **kwargs):
             Patient.objects.create(user=instance)
 
 
-
 @receiver(post_save, sender=User)
-def send_welcome_email(sender, instance, created, **kwargs):
-    if created:
-        if instance.is_doctor:
-            subject = "Welcome to MediPoint – Your Health, Our Priority!"
-            template_name = "emails/new_doctor_registration.html"
-            context = {
-                "doctor_name": instance.full_name,
-                "support_email": "support@medipoint.com",
-                "support_phone": "+1234567890",
-            }
-            
-        elif instance.is_patient:   
-            subject = "Welcome to MediPoint – Your Health, Our Priority!"
-            template_name = "emails/new_patient_registration.html"
-            context = {
-                "patient_name": instance.full_name,
-                "support_email": "support@medipoint.com",
-                "support_phone": "+1234567890",
-            }
-            
-        send_email_template.delay(subject, template_name, context, instance.email)
\ No newline at end of file
+def publish_user_registered(sender, instance, created, raw=False, **kwargs):
+    """
+    Welcome every new doctor and patient, whether they signed up, were added in
+    the admin or came from a seeder. Accounts still to be verified get the link.
+    """
+    if not created or raw or not (instance.is_doctor or instance.is_patient):
+        return
+
+    verify_url = None
+    if not instance.is_email_verified:
+        uid = urlsafe_base64_encode(force_bytes(instance.pk))
+        token = email_verification_token.make_token(instance)
+        verify_url = f"{settings.FRONTEND_URL}/verify-email/?uid={uid}&token={token}"
+
+    publish(
+        "user.registered",
+        role=instance.role,
+        full_name=instance.full_name,
+        email=instance.email,
+        verify_url=verify_url,
+    )
+
+
+@subscribe("user.registered")
+def send_welcome_email(role, full_name, email, verify_url=None, **payload):
+    context = {
+        "verify_url": verify_url,
+        "support_email": "support@medipoint.com",
+        "support_phone": "+1234567890",
+    }
+    if role == User.Roles.DOCTOR:
+        template_name = "emails/new_doctor_registration.html"
+        context["doctor_name"] = full_name
+    else:
+        template_name = "emails/new_patient_registration.html"
+        context["patient_name"] = full_name
+
+    send_email_template(
+        "Welcome to MediPoint – Your Health, Our Priority!", template_name, context, email
+    )
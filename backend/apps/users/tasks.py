@@ -1,19 +1,51 @@
 # tasks.py
 from celery import shared_task
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
 from django.utils.html import strip_tags
 
-@shared_task
-def send_email_template(subject, template_name, context, to_email):
-    html_content = render_to_string(template_name, context)
-    text_content = strip_tags(html_content)  
-    
+FROM_EMAIL = "MediPoint@decodaai.com"
+
+
+def build_email(subject, template, context, to_email):
+    html_content = template.render(context)
+    text_content = strip_tags(html_content)
+
     email = EmailMultiAlternatives(
         subject=subject,
         body=text_content,
-        from_email="MediPoint@decodaai.com",
+        from_email=FROM_EMAIL,
         to=[to_email],
     )
     email.attach_alternative(html_content, "text/html")
-    email.send()
\ No newline at end of file
+    return email
+
+
+@shared_task
+def send_email_template(subject, template_name, context, to_email):
+    build_email(subject, get_template(template_name), context, to_email).send()
+
+
+@shared_task
+def send_email_template_batch(subject, template_name, recipients):
+    """
+    Sends one templated email to many recipients.
+
+    ``recipients`` is a list of ``(context, to_email)`` pairs. The template is
+    compiled once and every message goes out over a single connection. A
+    failing recipient doesn't stop the rest; failures are returned as
+    ``{"to": ..., "error": ...}`` entries next to the number of emails sent.
+    """
+    template = get_template(template_name)
+    failed = []
+    sent = 0
+
+    with get_connection() as connection:
+        for context, to_email in recipients:
+            try:
+                email = build_email(subject, template, context, to_email)
+                sent += connection.send_messages([email])
+            except Exception as e:
+                failed.append({"to": to_email, "error": str(e)})
+
+    return {"sent": sent, "failed": failed}
@@ -1 +1,186 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.appointments.models import Appointment
+from apps.core.events import dispatch_events
+from apps.doctors.models import WorkingHours
+from apps.patients.models import Patient
+
+from .models import User
+from .tasks import build_email, send_email_template_batch
+
+
+def make_cursor(position, reverse=False):
+    payload = json.dumps({"p": position, "r": reverse})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+    """Keyset paging of the doctor's appointment list, ordered by ``-created_at, -id``."""
+
+    def setUp(self):
+        doctor = User.objects.create_user(
+            email="doctor@example.com", full_name="Doctor", role=User.Roles.DOCTOR
+        )
+        start = timezone.now() + timedelta(days=1)
+        working_hours = WorkingHours.objects.create(
+            doctor=doctor.doctor, start_time=start, end_time=start + timedelta(hours=4)
+        )
+        for i in range(7):
+            user = User.objects.create_user(
+                email=f"patient{i}@example.com", full_name=f"Patient {i}", role=User.Roles.PATIENT
+            )
+            Appointment.objects.create(
+                patient=Patient.objects.get(user=user),
+                doctor=doctor.doctor,
+                working_hours=working_hours,
+                fees=10,
+            )
+
+        ids = list(Appointment.objects.order_by("id").values_list("id", flat=True))
+        now = timezone.now()
+        # Two distinct times, a three-way tie and two rows without created_at
+        Appointment.objects.filter(pk=ids[0]).update(created_at=now - timedelta(days=3))
+        Appointment.objects.filter(pk=ids[1]).update(created_at=now)
+        Appointment.objects.filter(pk__in=ids[2:5]).update(created_at=now - timedelta(days=1))
+        Appointment.objects.filter(pk__in=ids[5:]).update(created_at=None)
+        # Newest first, ties by id descending, NULLs last
+        self.expected = [ids[1], ids[4], ids[3], ids[2], ids[0], ids[6], ids[5]]
+
+        self.client = APIClient()
+        self.client.force_authenticate(doctor)
+
+    def get_page(self, cursor="", **params):
+        response = self.client.get("/api/appointments/", {"cursor": cursor, "page_size": 2, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, page):
+        return [row["id"] for row in page["results"]]
+
+    def walk_forward(self):
+        pages = [self.get_page()]
+        while pages[-1]["next"] != -1:
+            pages.append(self.get_page(pages[-1]["next"]))
+        return pages
+
+    def test_forward_paging_covers_ties_and_nulls_in_order(self):
+        pages = self.walk_forward()
+
+        self.assertEqual([row for page in pages for row in self.ids(page)], self.expected)
+        self.assertEqual(len(pages), 4)
+        self.assertEqual(pages[0]["previous"], -1)
+
+    def test_backward_paging_returns_the_same_pages(self):
+        forward = self.walk_forward()
+
+        backward = [forward[-1]]
+        while backward[-1]["previous"] != -1:
+            backward.append(self.get_page(backward[-1]["previous"]))
+
+        self.assertEqual([self.ids(page) for page in reversed(backward)], [self.ids(page) for page in forward])
+        # Back on the first page there is nothing before it
+        self.assertEqual(backward[-1]["previous"], -1)
+        self.assertNotEqual(backward[-1]["next"], -1)
+
+    def test_count_is_opt_in(self):
+        self.assertIsNone(self.get_page()["count"])
+        self.assertEqual(self.get_page(count="true")["count"], 7)
+
+    def test_invalid_cursors_are_not_found(self):
+        cursors = [
+            "not-a-cursor",
+            make_cursor([None]),
+            base64.urlsafe_b64encode(b'{"p": 1, "r": false}').decode(),
+            make_cursor(["not-a-date", 1]),
+            make_cursor([timezone.now().isoformat(), "not-an-id"]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get("/api/appointments/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_without_cursor_pages_by_number(self):
+        response = self.client.get("/api/appointments/", {"page_size": 2, "page": 2})
+
+        self.assertEqual(response.data["count"], 7)
+        self.assertEqual(response.data["total_pages"], 4)
+        self.assertEqual(response.data["previous"], 1)
+        self.assertEqual(response.data["next"], 3)
+
+
+class SendEmailTemplateBatchTests(SimpleTestCase):
+    def recipients(self, *emails):
+        return [({"doctor_name": email.split("@")[0].title()}, email) for email in emails]
+
+    def test_sends_every_message_over_one_connection(self):
+        with mock.patch("apps.users.tasks.get_connection", wraps=mail.get_connection) as get_connection:
+            result = send_email_template_batch(
+                "Verified", "emails/doctor_verified.html", self.recipients("a@example.com", "b@example.com")
+            )
+
+        get_connection.assert_called_once_with()
+        self.assertEqual(result, {"sent": 2, "failed": []})
+        self.assertEqual([email.to for email in mail.outbox], [["a@example.com"], ["b@example.com"]])
+        self.assertIn("Dr. A,", mail.outbox[0].alternatives[0][0])
+        self.assertIn("Dr. B,", mail.outbox[1].body)
+
+    def test_a_failing_recipient_does_not_stop_the_rest(self):
+        def build(subject, template, context, to_email):
+            if to_email == "b@example.com":
+                raise ValueError("bad address")
+            return build_email(subject, template, context, to_email)
+
+        with mock.patch("apps.users.tasks.build_email", side_effect=build):
+            result = send_email_template_batch(
+                "Verified",
+                "emails/doctor_verified.html",
+                self.recipients("a@example.com", "b@example.com", "c@example.com"),
+            )
+
+        self.assertEqual(result, {"sent": 2, "failed": [{"to": "b@example.com", "error": "bad address"}]})
+        self.assertEqual([email.to for email in mail.outbox], [["a@example.com"], ["c@example.com"]])
+
+
+class WelcomeEmailTests(TestCase):
+    def create_user(self, role, **extra_fields):
+        with mock.patch("apps.core.events.dispatch_events") as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.create_user(
+                    email="new@example.com", full_name="Newcomer", role=role, **extra_fields
+                )
+
+        # What the worker does with the queued tasks
+        for call in dispatch.delay.call_args_list:
+            dispatch_events(*call.args)
+
+    def test_users_created_outside_sign_up_are_welcomed(self):
+        for role in (User.Roles.DOCTOR, User.Roles.PATIENT):
+            with self.subTest(role=role.label):
+                mail.outbox.clear()
+                User.objects.filter(email="new@example.com").delete()
+
+                self.create_user(role)
+
+                self.assertEqual(len(mail.outbox), 1)
+                self.assertEqual(mail.outbox[0].to, ["new@example.com"])
+                self.assertIn("Newcomer", mail.outbox[0].body)
+                self.assertIn("/verify-email/?uid=", mail.outbox[0].alternatives[0][0])
+
+    def test_verified_users_get_no_verification_link(self):
+        self.create_user(User.Roles.PATIENT, is_email_verified=True)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertNotIn("/verify-email/", mail.outbox[0].alternatives[0][0])
+
+    def test_admins_are_not_welcomed(self):
+        self.create_user(User.Roles.ADMIN, is_staff=True, is_superuser=True)
+
+        self.assertEqual(mail.outbox, [])
@@ -2,6 +2,7 @@ from datetime import timedelta
 from pathlib import Path
 import os
 import environ
+from celery.schedules import crontab
 
 
 env = environ.Env()
@@ -59,13 +60,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
-    "apps.authn.middlewares.JWTSessionMiddleware",  # Custom JWT Session Middleware
+    "apps.authn.middlewares.JWTSessionMiddleware",  # Session keyed by the JWT, replaces SessionMiddleware
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "apps.core.middlewares.DomainEventsMiddleware",  # Publishes a request's domain events after commit
 ]
 
 
@@ -161,7 +162,7 @@ GEMINI_API_KEY = env("GOOGLE_API_KEY")
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.authn.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",  # Ensure webhooks are not blocked
@@ -171,7 +172,21 @@ REST_FRAMEWORK = {
     "PAGE_SIZE_QUERY_PARAM": "page_size",  # Allows dynamic page size from frontend
 }
 
-SESSION_ENGINE = "django.contrib.sessions.backends.db"  # Ensure session data is stored
+# Local memory by default (tests), local/production settings point these at Redis
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sessions",
+    },
+}
+
+# Sessions are read from the cache, so authenticated API calls don't query django_session;
+# writes also go to the table so a cache flush doesn't log everyone out of the chatbot
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
 SESSION_COOKIE_NAME = "sessionid"  # Default session cookie name
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = "Lax"  # Adjust as needed (can be 'None' if cross-origin)
@@ -319,3 +334,57 @@ SERVE_PROTECTED_MEDIA_DIRECT = (
 
 
 FRONTEND_URL = env("FRONTEND_URL", default="http://localhost:3000")
+
+
+# Seconds a DoctorInitAPIView snapshot lives before it is rebuilt from scratch
+DOCTORS_INIT_SNAPSHOT_TIMEOUT = env.int("DOCTORS_INIT_SNAPSHOT_TIMEOUT", default=300)
+
+# Default number of days ahead generate_working_hours_task fills in from schedules
+WORKING_HOURS_HORIZON_DAYS = env.int("WORKING_HOURS_HORIZON_DAYS", default=7)
+# Ended working hours marked done per statement by archive_past_working_hours
+WORKING_HOURS_ARCHIVE_BATCH_SIZE = env.int("WORKING_HOURS_ARCHIVE_BATCH_SIZE", default=1000)
+# Upcoming working hours embedded in doctor payloads: the next N days, at most M slots per doctor
+DOCTOR_WORKING_HOURS_DAYS = env.int("DOCTOR_WORKING_HOURS_DAYS", default=14)
+DOCTOR_WORKING_HOURS_LIMIT = env.int("DOCTOR_WORKING_HOURS_LIMIT", default=50)
+
+# Chatbot conversation storage, see apps.chatbot.stores
+CHATBOT_SESSION_STORE = env(
+    "CHATBOT_SESSION_STORE", default="apps.chatbot.stores.CacheSessionStore"
+)
+CHATBOT_SESSION_CACHE = env("CHATBOT_SESSION_CACHE", default="default")
+# Idle seconds before a conversation is dropped
+CHATBOT_SESSION_TTL = env.int("CHATBOT_SESSION_TTL", default=1800)
+# Question/answer exchanges kept per conversation
+CHATBOT_MAX_TURNS = env.int("CHATBOT_MAX_TURNS", default=20)
+# Conversations kept per process by InMemorySessionStore
+CHATBOT_MAX_SESSIONS = env.int("CHATBOT_MAX_SESSIONS", default=1000)
+# "google" for Gemini, "fake" for canned replies without network access (benchmarks)
+CHATBOT_LLM_BACKEND = env("CHATBOT_LLM_BACKEND", default="google")
+# Local specialty matches scoring below this are double-checked with the LLM
+CHATBOT_SPECIALTY_MATCH_THRESHOLD = env.float("CHATBOT_SPECIALTY_MATCH_THRESHOLD", default=0.9)
+
+# Expired django_session rows deleted per statement by purge_expired_sessions
+SESSION_PURGE_BATCH_SIZE = env.int("SESSION_PURGE_BATCH_SIZE", default=1000)
+
+# "sync" handles Stripe webhooks in the request, "queue" only stores them for process_webhook_events
+STRIPE_WEBHOOK_MODE = env("STRIPE_WEBHOOK_MODE", default="sync")
+# Stored webhook events handled per transaction by process_webhook_events
+STRIPE_WEBHOOK_BATCH_SIZE = env.int("STRIPE_WEBHOOK_BATCH_SIZE", default=100)
+# Create the Stripe Checkout session in the background right after booking
+STRIPE_PRECREATE_CHECKOUT = env.bool("STRIPE_PRECREATE_CHECKOUT", default=False)
+
+# Merged into the django_celery_beat tables when beat starts, editable from the admin afterwards
+CELERY_BEAT_SCHEDULE = {
+    "purge-expired-sessions": {
+        "task": "apps.authn.tasks.purge_expired_sessions",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "archive-past-working-hours": {
+        "task": "apps.doctors.tasks.archive_past_working_hours",
+        "schedule": crontab(minute=15),
+    },
+    "process-webhook-events": {
+        "task": "apps.appointments.tasks.process_webhook_events",
+        "schedule": env.float("STRIPE_WEBHOOK_POLL_INTERVAL", default=5.0),
+    },
+}
@@ -45,6 +45,19 @@ DEFAULT_FROM_EMAIL = "medipoint@decodaai.com"  # if you don't already have this
 # SERVER_EMAIL = ""  # ditto (default from-email for Django errors)
 
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/1",
+    },
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/1",
+        "KEY_PREFIX": "sessions",
+    },
+}
+
+
 # Celery settings for local development
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
@@ -48,6 +48,20 @@ ANYMAIL = {
 }
 
 
+# Cache shared by all workers (DoctorInitAPIView snapshots live here)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env("REDIS_URL"),
+    },
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env("REDIS_URL"),
+        "KEY_PREFIX": "sessions",
+    },
+}
+
+
 # Celery settings
 CELERY_BROKER_URL = env('CELERY_BROKER_URL')  
 CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND')   